@@ -1,11 +1,46 @@
 import streamlit as st
 from datetime import datetime, timedelta
-from auth import init_session_state, check_auth, login_page, logout, hash_password
-from database import (init_db, add_product, get_products, delete_product,
-                     add_inventory_movement, get_inventory_report, get_latest_inventory_movements, 
-                     delete_inventory_movement, get_detailed_movements_report, get_summary_report, 
-                     add_user, update_user, get_users, delete_user, check_user_permission)
-from utils import export_to_excel, format_date
+from auth import init_session_state, check_auth, login_page, logout, hash_password, has_permission
+from database import (init_db, add_product, get_product_catalog, get_categories, delete_products,
+                     search_products, find_similar_products, fold_search_text,
+                     add_inventory_movement, get_inventory_report, get_movements_page, 
+                     delete_inventory_movement, count_detailed_movements,
+                     get_detailed_movements_preview, get_summary_report,
+                     add_user, update_user, get_users, delete_user,
+                     close_period, get_closed_periods, get_stock_as_of, set_profiling)
+from utils import deferred_export, export_detailed_report, export_summary_report, format_date
+from cache import get_table_version
+from jobs import REPORT_KINDS, submit_report_job, list_jobs, read_job_file
+import profiling
+
+# Stok sayfasında bir sayfada gösterilen hareket sayısı
+MOVEMENTS_PAGE_SIZE = 20
+# Ürün arama kutularında gösterilen en fazla sonuç
+PRODUCT_SEARCH_LIMIT = 50
+# Ürün tanımlama sayfasındaki sayfa boyutu seçenekleri
+PRODUCT_PAGE_SIZES = (25, 50, 100)
+# Kullanıcı yönetimi sayfasında bir sayfada gösterilen kullanıcı sayısı
+USERS_PAGE_SIZE = 25
+# Arka plan rapor işlerinin durum etiketleri
+JOB_STATUS_LABELS = {'queued': "Sırada", 'running': "Hazırlanıyor"}
+
+
+def prepared_download(key, label, read_file, file_name, mime=None):
+    """İndirme dosyasını iki adımda sunar: ``label`` butonu dosyayı hazırlatır,
+    sonraki çalıştırmalarda ``read_file()`` içeriğiyle indirme butonu çizilir.
+    (streamlit 1.44 indirme butonu ertelenmiş veri kabul etmez; dosyalar her
+    çalıştırmada üretilmesin diye hazırlık kullanıcı isteyince yapılır.)"""
+    prepared = st.session_state.setdefault('prepared_downloads', set())
+    if key not in prepared:
+        if st.button(label, key=f"prepare_{key}"):
+            prepared.add(key)
+            st.rerun()
+        return
+    with st.spinner("Dosya hazırlanıyor..."):
+        data = read_file()
+    st.download_button(label=f"İndir: {file_name}", data=data, file_name=file_name,
+                       mime=mime, key=f"download_{key}")
+
 
 # Initialize database and session state
 init_db()
@@ -25,15 +60,15 @@ else:
     st.sidebar.title(f"Hoş Geldiniz, {st.session_state.username}!")
 
     # Admin için ekstra sayfa seçeneği
-    if st.session_state.is_admin:
-        pages = ["Stok Ekle/Düzenle", "Ürün Tanımlama", "Raporlama", "Kullanıcı Yönetimi"]
+    if has_permission("is_admin"):
+        pages = ["Stok Ekle/Düzenle", "Ürün Tanımlama", "Raporlama", "Kullanıcı Yönetimi", "Sorgu İstatistikleri"]
     else:
         pages = []
-        if check_user_permission(st.session_state.user_id, "can_manage_inventory"):
+        if has_permission("can_manage_inventory"):
             pages.append("Stok Ekle/Düzenle")
-        if check_user_permission(st.session_state.user_id, "can_add_product"):
+        if has_permission("can_add_product"):
             pages.append("Ürün Tanımlama")
-        if check_user_permission(st.session_state.user_id, "can_view_reports"):
+        if has_permission("can_view_reports"):
             pages.append("Raporlama")
 
     # Varsayılan sayfa "Stok Ekle/Düzenle" olarak ayarla
@@ -89,69 +124,132 @@ else:
         if st.sidebar.button("Çıkış Yap"):
             logout()
 
-        if page == "Ürün Tanımlama" and (st.session_state.is_admin or check_user_permission(st.session_state.user_id, "can_add_product")):
+        if page == "Ürün Tanımlama" and has_permission("can_add_product"):
             st.title("Ürün Tanımlama")
 
             with st.form("add_product_form"):
                 product_name = st.text_input("Ürün Adı")
+                categories = dict(get_categories())
                 product_category = st.selectbox(
                     "Ürün Bölümü",
-                    ["TEMİZLİK", "BAR", "MUTFAK", "İÇECEK", "PASTA", "DONDURMA", "GENEL"]
+                    list(categories),
+                    format_func=categories.get
                 )
 
+                allow_similar = st.checkbox("Benzer ürün olsa da ekle")
+
                 if st.form_submit_button("Ürün Ekle"):
                     if product_name:
-                        success, message = add_product(product_name, product_category)
-                        if success:
-                            st.success(message)
-                            st.rerun()
+                        similar = find_similar_products(product_name)
+                        if similar and not allow_similar:
+                            st.warning(
+                                "Benzer ürünler zaten tanımlı: "
+                                + ", ".join(name for _, name, _ in similar)
+                                + ". Yine de eklemek için kutucuğu işaretleyin."
+                            )
                         else:
-                            st.error(message)
+                            success, message = add_product(product_name, product_category)
+                            if success:
+                                st.success(message)
+                                st.rerun()
+                            else:
+                                st.error(message)
                     else:
                         st.error("Lütfen ürün adını giriniz")
 
             # Mevcut ürünleri göster
             st.subheader("Tanımlı Ürünler")
-            products_df = get_products()
-
-            if not products_df.empty:
-                # Kategori bazında grupla
-                categories = sorted(products_df['category'].unique())
+            catalog = get_product_catalog()
+
+            if catalog:
+                filter_col1, filter_col2, filter_col3 = st.columns([2, 3, 1])
+                with filter_col1:
+                    category_filter = st.selectbox(
+                        "Bölüm", [None] + catalog.categories,
+                        format_func=lambda category_id: "Tümü" if category_id is None else catalog.category_name(category_id),
+                        key="product_category_filter"
+                    )
+                with filter_col2:
+                    product_query = st.text_input("Ürün Ara", key="product_page_search",
+                                                  placeholder="Ürün adı veya bölüm")
+                with filter_col3:
+                    page_size = st.selectbox("Sayfa Boyutu", PRODUCT_PAGE_SIZES, key="product_page_size")
+
+                product_ids = catalog.ids if category_filter is None else catalog.ids_in(category_filter)
+                if product_query:
+                    matches = {product_id for product_id, _, _ in search_products(product_query, len(catalog))}
+                    product_ids = [product_id for product_id in product_ids if product_id in matches]
+
+                # Filtre değişince ilk sayfaya dön
+                product_filter = (category_filter, product_query, page_size)
+                if st.session_state.get('product_filter') != product_filter:
+                    st.session_state.product_filter = product_filter
+                    st.session_state.product_page = 0
+                page_count = max(1, -(-len(product_ids) // page_size))
+                page_index = min(st.session_state.product_page, page_count - 1)
+                visible_ids = product_ids[page_index * page_size:(page_index + 1) * page_size]
+
+                if visible_ids:
+                    # Yalnızca görünen sayfa çizilir; seçim tablo üzerinden yapılır
+                    table = st.dataframe(
+                        {
+                            "Ürün Adı": [catalog.name(product_id) for product_id in visible_ids],
+                            "Bölüm": [catalog.category(product_id) for product_id in visible_ids],
+                        },
+                        hide_index=True,
+                        on_select="rerun",
+                        selection_mode="multi-row",
+                        # Anahtar sayfaya, filtreye ve tablo sürümüne bağlı; seçim başka
+                        # sayfaya ya da silme sonrası kayan satırlara taşınmaz
+                        key=f"product_table_{page_index}_{hash(product_filter)}_{get_table_version('products')}",
+                    )
+                    selected_ids = [visible_ids[row] for row in table.selection.rows]
 
-                for category in categories:
-                    st.markdown(f"**{category}**")
-                    category_products = products_df[products_df['category'] == category]
+                    nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+                    with nav_col1:
+                        if st.button("◀ Önceki", key="products_prev", disabled=page_index == 0):
+                            st.session_state.product_page = page_index - 1
+                            st.rerun()
+                    with nav_col2:
+                        st.write(f"Sayfa {page_index + 1} / {page_count} ({len(product_ids)} ürün)")
+                    with nav_col3:
+                        if st.button("Sonraki ▶", key="products_next", disabled=page_index >= page_count - 1):
+                            st.session_state.product_page = page_index + 1
+                            st.rerun()
 
-                    for _, row in category_products.iterrows():
-                        col1, col2, col3 = st.columns([2, 2, 1])
-                        with col1:
-                            st.write(row['name'])
-                        with col2:
-                            st.write(f"Bölüm: {row['category']}")
-                        with col3:
-                            if st.button("Sil", key=f"delete_{row['id']}"):
-                                success, message = delete_product(row['id'])
-                                if success:
-                                    st.success(message)
-                                    st.rerun()
-                                else:
-                                    st.error(message)
-                        st.divider()
+                    if selected_ids:
+                        st.warning("Seçilen ürünler stok hareketleriyle birlikte silinir.")
+                    if st.button(f"Seçilenleri Sil ({len(selected_ids)})", disabled=not selected_ids):
+                        success, message = delete_products(selected_ids)
+                        if success:
+                            st.success(message)
+                            st.rerun()
+                        else:
+                            st.error(message)
+                else:
+                    st.info("Filtreye uyan ürün bulunamadı.")
             else:
                 st.info("Henüz ürün tanımlanmamış.")
 
-        elif page == "Stok Ekle/Düzenle" and (st.session_state.is_admin or check_user_permission(st.session_state.user_id, "can_manage_inventory")):
+        elif page == "Stok Ekle/Düzenle" and has_permission("can_manage_inventory"):
             st.title("Stok Güncelleme")
 
-            products_df = get_products()
-            if not products_df.empty:
+            catalog = get_product_catalog()
+            if catalog:
+                # Form dışında olduğu için yazıldıkça ürün listesini daraltır
+                product_query = st.text_input("Ürün Ara", key="stock_product_search",
+                                              placeholder="Ürün adı veya bölüm")
+                product_options = catalog.ids
+                if product_query:
+                    product_options = [product_id for product_id, _, _ in search_products(product_query, PRODUCT_SEARCH_LIMIT)]
+                    if not product_options:
+                        st.info("Aramaya uyan ürün bulunamadı.")
+
                 with st.form("update_stock_form"):
                     product_id = st.selectbox(
                         "Ürün",
-                        options=products_df['id'].tolist(),
-                        format_func=lambda x: products_df[
-                            products_df['id']==x
-                        ]['name'].iloc[0]
+                        options=product_options,
+                        format_func=catalog.name
                     )
 
                     col1, col2 = st.columns(2)
@@ -242,42 +340,70 @@ else:
                         </style>
                     """, unsafe_allow_html=True)
 
-                    latest_movements = get_latest_inventory_movements(100)  # Daha fazla hareket göster
-                    if latest_movements:
+                    # Filtre değişince ilk sayfaya dön
+                    movement_filter = (filter_start, filter_end)
+                    if st.session_state.get('movement_filter') != movement_filter:
+                        st.session_state.movement_filter = movement_filter
+                        st.session_state.movement_cursors = []
+                    cursors = st.session_state.movement_cursors
+
+                    movements, next_cursor = get_movements_page(
+                        filter_start.strftime('%Y-%m-%d %H:%M:%S'),
+                        filter_end.strftime('%Y-%m-%d %H:%M:%S'),
+                        after_cursor=cursors[-1] if cursors else None,
+                        page_size=MOVEMENTS_PAGE_SIZE
+                    )
+                    if movements:
                         with st.container():
                             st.markdown('<div class="movement-container">', unsafe_allow_html=True)
-                            for movement in latest_movements:
+                            for movement in movements:
                                 movement_date = datetime.strptime(movement['local_date'], '%Y-%m-%d %H:%M:%S')
-                                if filter_start <= movement_date <= filter_end:
-                                    # Standart görünüm
-                                    col1, col2 = st.columns(2)
-                                    with col1:
-                                        st.write(f"**{movement['product_name']}**")
-                                        st.write(f"Bölüm: {movement['product_category']}")
-                                    with col2:
-                                        st.write(f"Tarih: {movement_date.strftime('%d.%m.%Y %H:%M')}")
-                                        st.write(f"Miktar: {movement['quantity']} {movement['unit']}")
-                                        st.write(f"Toplam: {movement['total_price']:.2f} TL")
-
-                                    # Hareket silme butonunu da iyileştir
-                                    button_key = f"delete_movement_{movement['movement_id']}"
-                                    if st.button("Hareketi Sil", key=button_key):
-                                        with st.spinner("Hareket siliniyor..."):
-                                            success, message = delete_inventory_movement(movement['movement_id'])
-                                            if success:
-                                                st.success(message)
-                                                st.rerun()
-                                            else:
-                                                st.error(message)
-                                    st.divider()
+                                # Standart görünüm
+                                col1, col2 = st.columns(2)
+                                with col1:
+                                    st.write(f"**{movement['product_name']}**")
+                                    st.write(f"Bölüm: {movement['product_category']}")
+                                with col2:
+                                    st.write(f"Tarih: {movement_date.strftime('%d.%m.%Y %H:%M')}")
+                                    st.write(f"Miktar: {movement['quantity']} {movement['unit']}")
+                                    st.write(f"Toplam: {movement['total_price']:.2f} TL")
+
+                                # Hareket silme butonunu da iyileştir
+                                button_key = f"delete_movement_{movement['movement_id']}"
+                                if st.button("Hareketi Sil", key=button_key):
+                                    with st.spinner("Hareket siliniyor..."):
+                                        success, message = delete_inventory_movement(movement['movement_id'])
+                                        if success:
+                                            st.success(message)
+                                            st.rerun()
+                                        else:
+                                            st.error(message)
+                                st.divider()
                             st.markdown('</div>', unsafe_allow_html=True)
+
+                        # Sayfa gezinme
+                        nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+                        with nav_col1:
+                            if st.button("◀ Önceki", key="movements_prev", disabled=not cursors):
+                                cursors.pop()
+                                st.rerun()
+                        with nav_col2:
+                            st.write(f"Sayfa {len(cursors) + 1}")
+                        with nav_col3:
+                            if st.button("Sonraki ▶", key="movements_next", disabled=next_cursor is None):
+                                cursors.append(next_cursor)
+                                st.rerun()
+                    elif cursors:
+                        # Silme sonrası boş kalan sayfadan geri dön
+                        cursors.pop()
+                        st.rerun()
                     else:
-                        st.info("Henüz stok hareketi bulunmamaktadır.")
+                        st.info("Seçilen tarih aralığında stok hareketi bulunmamaktadır.")
 
             else:
                 st.warning("Henüz ürün tanımlanmamış. Lütfen önce ürün tanımlayınız.")
 
-        elif page == "Raporlama" and (st.session_state.is_admin or check_user_permission(st.session_state.user_id, "can_view_reports")):
+        elif page == "Raporlama" and has_permission("can_view_reports"):
             st.title("Stok ve Değer Raporu")
 
             col1, col2 = st.columns(2)
@@ -301,66 +427,89 @@ else:
                 )
 
             if st.button("Rapor Oluştur"):
-                # Tarih ve saatleri birleştir
-                start_datetime = datetime.combine(start_date, start_time)
-                end_datetime = datetime.combine(end_date, end_time)
+                # Tarih ve saatleri birleştir; rapor, indirme dosyası hazırlanırken
+                # yapılan yeniden çalıştırmalarda da görünsün diye saklanır
+                st.session_state.report_request = (datetime.combine(start_date, start_time),
+                                                   datetime.combine(end_date, end_time))
+
+            if st.session_state.get('report_request'):
+                start_datetime, end_datetime = st.session_state.report_request
+
+                report_range = (
+                    start_datetime.strftime('%Y-%m-%d %H:%M:%S'),
+                    end_datetime.strftime('%Y-%m-%d %H:%M:%S')
+                )
+                title_range = (
+                    start_datetime.strftime('%d.%m.%Y %H:%M'),
+                    end_datetime.strftime('%d.%m.%Y %H:%M')
+                )
+                file_range = f"{start_datetime.strftime('%Y-%m-%d_%H-%M')}_to_{end_datetime.strftime('%Y-%m-%d_%H-%M')}"
 
                 # Sekmeleri oluştur
                 tab1, tab2 = st.tabs(["Detaylı Hareket Raporu", "Özet Rapor"])
 
                 with tab1:
                     st.subheader("Detaylı Hareket Raporu")
-                    detailed_df = get_detailed_movements_report(
-                        start_datetime.strftime('%Y-%m-%d %H:%M:%S'),
-                        end_datetime.strftime('%Y-%m-%d %H:%M:%S')
-                    )
+                    # Tüm aralık yalnızca indirilen dosyaya akıtılır; sayfada sayı ve önizleme gösterilir
+                    detailed_count = count_detailed_movements(*report_range)
 
-                    if not detailed_df.empty:
-                        # Excel aktarma butonunu üste yerleştir
-                        excel_data = export_to_excel(
-                            detailed_df,
-                            start_date=start_datetime.strftime('%d.%m.%Y %H:%M'),
-                            end_date=end_datetime.strftime('%d.%m.%Y %H:%M')
-                        )
-                        col1, col2 = st.columns([1, 3])
+                    if detailed_count:
+                        # Dosyalar yalnızca butona tıklandığında, DataFrame yerine
+                        # doğrudan veritabanı imlecinden üretilir
+                        col1, col2, col3 = st.columns([1, 1, 2])
                         with col1:
-                            st.download_button(
-                                label="Detaylı Raporu Excel'e Aktar",
-                                data=excel_data,
-                                file_name=f"detayli_stok_raporu_{start_datetime.strftime('%Y-%m-%d_%H-%M')}_to_{end_datetime.strftime('%Y-%m-%d_%H-%M')}.xlsx",
-                                mime="application/vnd.ms-excel"
+                            prepared_download(
+                                f"detailed_xlsx_{file_range}",
+                                "Detaylı Raporu Excel'e Aktar",
+                                deferred_export(
+                                    'detailed_xlsx', export_detailed_report, *report_range,
+                                    title_range=title_range
+                                ),
+                                f"detayli_stok_raporu_{file_range}.xlsx",
+                                "application/vnd.ms-excel"
+                            )
+                        with col2:
+                            prepared_download(
+                                f"detailed_csv_{file_range}",
+                                "CSV Olarak İndir",
+                                deferred_export(
+                                    'detailed_csv', export_detailed_report, *report_range,
+                                    file_format='csv'
+                                ),
+                                f"detayli_stok_raporu_{file_range}.csv",
+                                "text/csv"
                             )
 
                         # Veriyi göster
+                        detailed_df = get_detailed_movements_preview(*report_range)
                         st.dataframe(detailed_df)
+                        if detailed_count > len(detailed_df):
+                            st.caption(f"{detailed_count} hareketin ilk {len(detailed_df)} tanesi "
+                                       "gösteriliyor; tamamı için raporu indirin.")
                     else:
                         st.info("Seçilen tarih aralığında hareket bulunmamaktadır.")
 
                 with tab2:
                     st.subheader("Özet Rapor")
-                    summary_df = get_summary_report(
-                        start_datetime.strftime('%Y-%m-%d %H:%M:%S'),
-                        end_datetime.strftime('%Y-%m-%d %H:%M:%S')
-                    )
+                    summary_df = get_summary_report(*report_range)
 
                     if not summary_df.empty:
                         # Toplam değeri göster
                         total_value = summary_df['TOPLAM FİYAT'].sum()
                         st.metric("Toplam Stok Değeri", f"{total_value:.2f} TL")
 
-                        # Excel aktarma butonunu üste yerleştir
-                        excel_data = export_to_excel(
-                            summary_df,
-                            start_date=start_datetime.strftime('%d.%m.%Y %H:%M'),
-                            end_date=end_datetime.strftime('%d.%m.%Y %H:%M')
-                        )
+                        # Excel dosyası yalnızca butona tıklandığında oluşturulur
                         col1, col2 = st.columns([1, 3])
                         with col1:
-                            st.download_button(
-                                label="Özet Raporu Excel'e Aktar",
-                                data=excel_data,
-                                file_name=f"ozet_stok_raporu_{start_datetime.strftime('%Y-%m-%d_%H-%M')}_to_{end_datetime.strftime('%Y-%m-%d_%H-%M')}.xlsx",
-                                mime="application/vnd.ms-excel"
+                            prepared_download(
+                                f"summary_xlsx_{file_range}",
+                                "Özet Raporu Excel'e Aktar",
+                                deferred_export(
+                                    'summary_xlsx', export_summary_report, *report_range,
+                                    title_range=title_range
+                                ),
+                                f"ozet_stok_raporu_{file_range}.xlsx",
+                                "application/vnd.ms-excel"
                             )
 
                         # Veriyi göster
@@ -368,6 +517,88 @@ else:
                     else:
                         st.info("Seçilen tarih aralığında hareket bulunmamaktadır.")
 
+            # Büyük raporlar işçi süreçlerde hazırlanır; oturum beklemez
+            st.divider()
+            st.subheader("Arka Planda Rapor Hazırla")
+            job_kind = st.selectbox("Rapor Türü", list(REPORT_KINDS),
+                                    format_func=lambda kind: REPORT_KINDS[kind][0])
+            if st.button("Kuyruğa Ekle"):
+                start_datetime = datetime.combine(start_date, start_time)
+                end_datetime = datetime.combine(end_date, end_time)
+                success, result = submit_report_job(
+                    job_kind,
+                    start_datetime.strftime('%Y-%m-%d %H:%M:%S'),
+                    end_datetime.strftime('%Y-%m-%d %H:%M:%S'),
+                    st.session_state.user_id,
+                    title_range=(start_datetime.strftime('%d.%m.%Y %H:%M'),
+                                 end_datetime.strftime('%d.%m.%Y %H:%M'))
+                )
+                if success:
+                    st.success("Rapor kuyruğa eklendi")
+                else:
+                    st.error(result)
+
+            report_jobs = list_jobs(st.session_state.user_id)
+            if report_jobs:
+                st.button("Durumu Yenile", key="refresh_jobs")
+                for job in report_jobs:
+                    job_col1, job_col2 = st.columns([3, 1])
+                    with job_col1:
+                        st.write(f"**{job['label']}** — {job['range'][0]} / {job['range'][1]}")
+                        if job['status'] == 'failed':
+                            st.error(f"Rapor hazırlanamadı: {job['error']}")
+                        elif job['status'] != 'done':
+                            st.progress(job['progress'], text=JOB_STATUS_LABELS[job['status']])
+                    with job_col2:
+                        if job['status'] == 'done':
+                            # Dosya yalnızca istendiğinde diskten okunur
+                            prepared_download(
+                                f"job_{job['id']}",
+                                "İndir",
+                                lambda job_id=job['id']: read_job_file(job_id) or b"",
+                                f"{job['kind']}_{job['range'][0][:10]}_{job['range'][1][:10]}{REPORT_KINDS[job['kind']][1]}"
+                            )
+
+            # Belirli bir andaki stok durumu
+            st.divider()
+            st.subheader("Tarihteki Stok Durumu")
+            as_of_col1, as_of_col2 = st.columns(2)
+            with as_of_col1:
+                as_of_date = st.date_input("Tarih", datetime.now().date(), key="as_of_date")
+            with as_of_col2:
+                as_of_time = st.time_input("Saat", datetime.strptime("23:59", "%H:%M").time(), key="as_of_time")
+
+            if st.button("Stok Durumunu Göster"):
+                as_of = datetime.combine(as_of_date, as_of_time).replace(second=59)
+                stock_df = get_stock_as_of(as_of)
+                if not stock_df.empty:
+                    st.metric("Toplam Stok Değeri", f"{stock_df['total_value'].sum():.2f} TL")
+                    st.dataframe(stock_df)
+                else:
+                    st.info("Seçilen tarihte stok bulunmamaktadır.")
+
+            # Dönem kapanışı (yalnızca admin)
+            if st.session_state.is_admin:
+                with st.expander("Dönem Kapanışı"):
+                    last_month = datetime.now().date().replace(day=1) - timedelta(days=1)
+                    close_col1, close_col2 = st.columns(2)
+                    with close_col1:
+                        close_year = st.number_input("Yıl", min_value=2000, max_value=2100,
+                                                     value=last_month.year, step=1)
+                    with close_col2:
+                        close_month = st.selectbox("Ay", list(range(1, 13)), index=last_month.month - 1)
+
+                    if st.button("Dönemi Kapat"):
+                        success, message = close_period(close_year, close_month, st.session_state.user_id)
+                        if success:
+                            st.success(message)
+                        else:
+                            st.error(message)
+
+                    closed_df = get_closed_periods()
+                    if not closed_df.empty:
+                        st.dataframe(closed_df)
+
         elif page == "Kullanıcı Yönetimi" and st.session_state.is_admin:
             st.title("Kullanıcı Yönetimi")
 
@@ -416,65 +647,140 @@ else:
             users_df = get_users()
 
             if not users_df.empty:
-                for _, user in users_df.iterrows():
-                    with st.expander(f"Kullanıcı: {user['username']}"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.write(f"ID: {user['id']}")
-                            st.write(f"Admin: {'Evet' if user['is_admin'] else 'Hayır'}")
-                        with col2:
-                            st.write(f"Ürün Ekleyebilir: {'Evet' if user['can_add_product'] else 'Hayır'}")
-                            st.write(f"Raporları Görebilir: {'Evet' if user['can_view_reports'] else 'Hayır'}")
-                            st.write(f"Stok Yönetebilir: {'Evet' if user['can_manage_inventory'] else 'Hayır'}")
-
-                        edit_col1, edit_col2, edit_col3 = st.columns(3)
-                        with edit_col1:
-                            new_password = st.text_input(f"Yeni Şifre", key=f"new_pass_{user['id']}", type="password")
-                        with edit_col2:
-                            if st.button("Şifre Güncelle", key=f"update_pass_{user['id']}"):
-                                if new_password:
-                                    hashed_password = hash_password(new_password)
-                                    success, message = update_user(user['id'], password=hashed_password)
-                                    if success:
-                                        st.success(message)
-                                        st.rerun()
-                                    else:
-                                        st.error(message)
+                user_query = st.text_input("Kullanıcı Ara", key="user_search", placeholder="Kullanıcı adı")
+                if user_query:
+                    folded_query = fold_search_text(user_query.strip())
+                    users_df = users_df[
+                        users_df['username'].map(fold_search_text).str.contains(folded_query, regex=False)
+                    ]
+
+                # Arama değişince ilk sayfaya dön
+                if st.session_state.get('user_filter') != user_query:
+                    st.session_state.user_filter = user_query
+                    st.session_state.user_page = 0
+                page_count = max(1, -(-len(users_df) // USERS_PAGE_SIZE))
+                page_index = min(st.session_state.user_page, page_count - 1)
+                page_df = users_df.iloc[page_index * USERS_PAGE_SIZE:(page_index + 1) * USERS_PAGE_SIZE]
+
+                if not page_df.empty:
+                    table = st.dataframe(
+                        {
+                            "Kullanıcı Adı": page_df['username'].tolist(),
+                            "Admin": page_df['is_admin'].astype(bool).tolist(),
+                            "Ürün Ekleyebilir": page_df['can_add_product'].astype(bool).tolist(),
+                            "Raporları Görebilir": page_df['can_view_reports'].astype(bool).tolist(),
+                            "Stok Yönetebilir": page_df['can_manage_inventory'].astype(bool).tolist(),
+                        },
+                        hide_index=True,
+                        on_select="rerun",
+                        selection_mode="single-row",
+                        # Silme/güncelleme sonrası eski satır numarası başka kullanıcıyı seçmesin
+                        key=f"user_table_{page_index}_{hash(user_query)}_{get_table_version('users')}",
+                    )
+
+                    nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+                    with nav_col1:
+                        if st.button("◀ Önceki", key="users_prev", disabled=page_index == 0):
+                            st.session_state.user_page = page_index - 1
+                            st.rerun()
+                    with nav_col2:
+                        st.write(f"Sayfa {page_index + 1} / {page_count} ({len(users_df)} kullanıcı)")
+                    with nav_col3:
+                        if st.button("Sonraki ▶", key="users_next", disabled=page_index >= page_count - 1):
+                            st.session_state.user_page = page_index + 1
+                            st.rerun()
+
+                    # Düzenleme formu yalnızca seçilen kullanıcı için çizilir
+                    if table.selection.rows:
+                        user = page_df.iloc[table.selection.rows[0]]
+                        user_id = int(user['id'])
+                        st.markdown(f"**Kullanıcı: {user['username']}** (ID: {user_id})")
+
+                        with st.form(f"edit_user_form_{user_id}"):
+                            pass_col1, pass_col2 = st.columns(2)
+                            with pass_col1:
+                                edit_password = st.text_input("Yeni Şifre", type="password",
+                                                              help="Boş bırakılırsa şifre değişmez")
+                            with pass_col2:
+                                edit_confirm = st.text_input("Yeni Şifre (Tekrar)", type="password")
+
+                            permission_col1, permission_col2 = st.columns(2)
+                            with permission_col1:
+                                user_is_admin = st.checkbox("Admin", value=bool(user['is_admin']))
+                                user_can_add_product = st.checkbox("Ürün Ekleyebilir", value=bool(user['can_add_product']))
+                            with permission_col2:
+                                user_can_view_reports = st.checkbox("Raporları Görebilir", value=bool(user['can_view_reports']))
+                                user_can_manage_inventory = st.checkbox("Stok Yönetebilir", value=bool(user['can_manage_inventory']))
+
+                            if st.form_submit_button("Değişiklikleri Kaydet"):
+                                if edit_password != edit_confirm:
+                                    st.error("Şifreler eşleşmiyor!")
                                 else:
-                                    st.error("Şifre boş olamaz!")
-                        with edit_col3:
-                            if user['id'] != st.session_state.user_id:  # Kendini silememeli
-                                if st.button("Kullanıcıyı Sil", key=f"delete_user_{user['id']}"):
-                                    success, message = delete_user(user['id'])
+                                    # Şifre ve yetkiler tek güncellemede yazılır
+                                    success, message = update_user(
+                                        user_id,
+                                        password=hash_password(edit_password) if edit_password else None,
+                                        is_admin=1 if user_is_admin else 0,
+                                        can_add_product=1 if user_can_add_product else 0,
+                                        can_view_reports=1 if user_can_view_reports else 0,
+                                        can_manage_inventory=1 if user_can_manage_inventory else 0
+                                    )
                                     if success:
                                         st.success(message)
                                         st.rerun()
                                     else:
                                         st.error(message)
 
-                        # Yetki güncelleme
-                        permission_col1, permission_col2 = st.columns(2)
-                        with permission_col1:
-                            user_is_admin = st.checkbox("Admin", key=f"admin_{user['id']}", value=bool(user['is_admin']))
-                            user_can_add_product = st.checkbox("Ürün Ekleyebilir", key=f"product_{user['id']}", value=bool(user['can_add_product']))
-                        with permission_col2:
-                            user_can_view_reports = st.checkbox("Raporları Görebilir", key=f"reports_{user['id']}", value=bool(user['can_view_reports']))
-                            user_can_manage_inventory = st.checkbox("Stok Yönetebilir", key=f"inventory_{user['id']}", value=bool(user['can_manage_inventory']))
-
-                        if st.button("Yetkileri Güncelle", key=f"update_perm_{user['id']}"):
-                            success, message = update_user(
-                                user['id'],
-                                is_admin=1 if user_is_admin else 0,
-                                can_add_product=1 if user_can_add_product else 0,
-                                can_view_reports=1 if user_can_view_reports else 0,
-                                can_manage_inventory=1 if user_can_manage_inventory else 0
-                            )
-                            if success:
-                                st.success(message)
-                                st.rerun()
-                            else:
-                                st.error(message)
+                        if user_id != st.session_state.user_id:  # Kendini silememeli
+                            if st.button("Kullanıcıyı Sil", key=f"delete_user_{user_id}"):
+                                success, message = delete_user(user_id)
+                                if success:
+                                    st.success(message)
+                                    st.rerun()
+                                else:
+                                    st.error(message)
+                    else:
+                        st.caption("Düzenlemek için listeden bir kullanıcı seçin.")
+                else:
+                    st.info("Aramaya uyan kullanıcı bulunamadı.")
             else:
                 st.info("Henüz kullanıcı bulunmamaktadır.")
+        elif page == "Sorgu İstatistikleri" and st.session_state.is_admin:
+            st.title("Sorgu İstatistikleri")
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                profiling_enabled = st.toggle("Ölçüm Açık", value=profiling.ENABLED)
+            with col2:
+                sample_rate = st.number_input("Örnekleme Oranı", min_value=0.0, max_value=1.0,
+                                              value=float(profiling.SAMPLE_RATE), step=0.05)
+            with col3:
+                slow_query_ms = st.number_input("Yavaş Sorgu Eşiği (ms)", min_value=0.0,
+                                                value=float(profiling.SLOW_QUERY_MS), step=10.0)
+
+            if (profiling_enabled, sample_rate, slow_query_ms) != (profiling.ENABLED, profiling.SAMPLE_RATE, profiling.SLOW_QUERY_MS):
+                set_profiling(profiling_enabled, sample_rate=sample_rate, slow_query_ms=slow_query_ms)
+
+            if st.button("İstatistikleri Sıfırla"):
+                profiling.reset_stats()
+
+            function_stats, statement_stats, slow_queries = profiling.get_stats()
+            st.subheader("Fonksiyonlar")
+            if function_stats:
+                st.dataframe(function_stats)
+            else:
+                st.info("Henüz ölçüm yok. Ölçümü açıp uygulamayı kullanın.")
+
+            st.subheader("Sorgular")
+            if statement_stats:
+                st.dataframe(statement_stats)
+
+            st.subheader("Yavaş Sorgular")
+            for entry in reversed(slow_queries):
+                with st.expander(f"{entry['function']} - {entry['ms']} ms - {entry['rows']} satır"):
+                    st.code(entry['statement'], language="sql")
+                    if entry['plan']:
+                        st.text(entry['plan'])
+
     else:
         st.warning("Herhangi bir sayfaya erişim izniniz bulunmamaktadır. Lütfen yönetici ile iletişime geçiniz.")
\ No newline at end of file
@@ -1,18 +1,14 @@
 import streamlit as st
-import hashlib
-from database import get_db
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+from cache import get_table_version
+from database import get_db, get_user_permissions, hash_password, PERMISSION_BITS
 
 def login_user(username, password):
-    conn = get_db()
-    c = conn.cursor()
     hashed_pw = hash_password(password)
-    c.execute("SELECT id, is_admin FROM users WHERE username = ? AND password = ?",
-             (username, hashed_pw))
-    result = c.fetchone()
-    conn.close()
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, is_admin FROM users WHERE username = ? AND password = ?",
+                 (username, hashed_pw))
+        result = c.fetchone()
     return result
 
 def init_session_state():
@@ -26,10 +22,34 @@ def init_session_state():
         st.session_state.is_admin = False
     if 'username' not in st.session_state:
         st.session_state.username = None
+    if 'permissions' not in st.session_state:
+        st.session_state.permissions = 0
+    if 'permissions_version' not in st.session_state:
+        st.session_state.permissions_version = None
     
     if st.session_state.remember_me and not st.session_state.logged_in:
         st.session_state.logged_in = True
 
+def load_permissions():
+    # Sürüm yüklemeden önce okunur; arada yapılan bir değişiklik sonraki
+    # çalıştırmada yeniden yüklemeye yol açar
+    version = get_table_version('users')
+    permissions = get_user_permissions(st.session_state.user_id)
+    st.session_state.permissions = permissions
+    st.session_state.permissions_version = version
+    st.session_state.is_admin = bool(permissions & PERMISSION_BITS['is_admin'])
+
+def has_permission(permission):
+    """Oturumdaki yetki maskesini kontrol eder; admin tüm yetkilere sahiptir.
+
+    Kullanıcılar tablosu güncellendiyse (update_user vb.) maske yeniden yüklenir,
+    aksi halde veritabanına gidilmez.
+    """
+    if st.session_state.get('permissions_version') != get_table_version('users'):
+        load_permissions()
+    mask = PERMISSION_BITS['is_admin'] | PERMISSION_BITS[permission]
+    return bool(st.session_state.permissions & mask)
+
 def check_auth():
     return st.session_state.logged_in
 
@@ -51,6 +71,7 @@ def login_page():
                 st.session_state.is_admin = bool(is_admin)
                 st.session_state.username = username
                 st.session_state.remember_me = remember_me
+                load_permissions()
                 st.success("Giriş başarılı!")
                 st.rerun()
             else:
@@ -58,7 +79,8 @@ def login_page():
 
 def logout():
     if not st.session_state.remember_me:
-        for key in ['logged_in', 'user_id', 'is_admin', 'remember_me', 'username']:
+        for key in ['logged_in', 'user_id', 'is_admin', 'remember_me', 'username',
+                    'permissions', 'permissions_version']:
             if key in st.session_state:
                 del st.session_state[key]
     else:
@@ -66,4 +88,6 @@ def logout():
         st.session_state.user_id = None
         st.session_state.is_admin = False
         st.session_state.username = None
+        st.session_state.permissions = 0
+        st.session_state.permissions_version = None
     st.rerun()
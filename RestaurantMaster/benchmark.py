@@ -0,0 +1,310 @@
+"""database.py sorguları ve Excel dışa aktarımı için ölçüm paketi.
+
+Örnek kullanım:
+
+    python benchmark.py --sizes small,medium --output sonuc.json
+    python benchmark.py --compare onceki.json sonuc.json
+
+Veri setleri create_demo_data.generate_dataset ile ``--data-dir`` altında
+bir kez üretilir ve sonraki çalıştırmalarda yeniden kullanılır. Her ölçümden
+önce önbellekler boşaltılır; sonuçlar SQLite ve pandas maliyetini gösterir.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cache
+import database
+from create_demo_data import generate_dataset
+
+# Veri seti boyutları: (ürün sayısı, hareket sayısı)
+DATASET_SIZES = {
+    'small': (200, 10_000),
+    'medium': (1000, 200_000),
+    'large': (1000, 2_000_000),
+}
+
+# Generator son tarihi 2025-01-01; aralıklar bu tarihe göre seçildi
+MONTH = ('2024-06-01 00:00:00', '2024-06-30 23:59:59')
+YEAR = ('2024-01-01 00:00:00', '2024-12-31 23:59:59')
+DELIVERY_LINES = 60
+# Toplu silme ölçümünde kullanılan ürün sayısı (ürün sayfasının varsayılan boyutu)
+DELETE_BATCH = 25
+# Yazma ölçümlerinde eklenip temizlikte silinen kayıtların adı
+BENCH_NAME = 'benchmark_kaydi'
+REGRESSION_THRESHOLD = 0.10
+# Bu farkın altındaki değişimler ölçüm gürültüsü sayılır
+MIN_DELTA_MS = 0.5
+
+
+def _count_rows(result):
+    if result is None:
+        return 0
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    if isinstance(result, tuple):
+        return 1
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+def _movement_rows(count):
+    return [{'product_id': 1 + idx % 50, 'quantity': 1, 'unit': 'kg', 'total_price': 10}
+            for idx in range(count)]
+
+
+def _delete_latest_movements(count):
+    with database.get_db() as conn:
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM inventory_movements ORDER BY id DESC LIMIT ?", (count,))]
+    for movement_id in ids:
+        database.delete_inventory_movement(movement_id)
+    return ids
+
+
+def _reopen_period(period):
+    with database.get_db() as conn:
+        conn.execute("DELETE FROM stock_snapshots WHERE period = ?", (period,))
+        conn.execute("DELETE FROM stock_periods WHERE period = ?", (period,))
+        conn.commit()
+
+
+def _export_case():
+    import utils
+    df = database.get_detailed_movements_report(*MONTH)
+
+    def export():
+        return utils.export_to_excel(df, start_date=MONTH[0], end_date=MONTH[1])
+    # Satır hızı çıktı baytlarına değil, yazılan rapor satırlarına göre hesaplanır
+    export.rows = len(df)
+    return export
+
+
+def _delete_case():
+    database.add_inventory_movements_bulk(_movement_rows(1), 1)
+    with database.get_db() as conn:
+        movement_id = conn.execute("SELECT MAX(id) FROM inventory_movements").fetchone()[0]
+    return lambda: database.delete_inventory_movement(movement_id)
+
+
+def _bench_products(count):
+    for idx in range(count):
+        database.add_product(f"{BENCH_NAME} {idx}")
+    return [r[0] for r in database.fetch_rows(
+        "SELECT id FROM products WHERE name LIKE ?", (BENCH_NAME + '%',))]
+
+
+def _delete_bench_products():
+    database.delete_products(_bench_products(0))
+
+
+def _bench_user():
+    database.add_user(BENCH_NAME, 'sifre')
+    return database.fetch_rows("SELECT id FROM users WHERE username = ?", (BENCH_NAME,))[0][0]
+
+
+def _delete_bench_user():
+    for row in database.fetch_rows("SELECT id FROM users WHERE username = ?", (BENCH_NAME,)):
+        database.delete_user(row[0])
+
+
+def _drain_case():
+    def drain():
+        batches = database.iter_detailed_movements_report(*YEAR)
+        next(batches)
+        return sum(len(rows) for rows in batches)
+    # Döndürülen sayı satır sayısıdır; tek sonuç gibi sayılmasın
+    drain.rows = database.count_detailed_movements(*YEAR)
+    return drain
+
+
+def _stream_case(write):
+    import utils
+    # Satırlar önceden okunur; ölçüm yalnızca dosyaya yazmayı kapsar
+    batches = list(database.iter_detailed_movements_report(*YEAR))
+
+    def export():
+        with tempfile.TemporaryFile() as output:
+            return getattr(utils, write)(batches, output)
+    export.rows = sum(len(rows) for rows in batches[1:])
+    return export
+
+
+# (ad, hazırlık -> ölçülecek fonksiyon, temizlik)
+CASES = [
+    ('get_products', lambda: database.get_products, None),
+    ('get_product_catalog', lambda: database.get_product_catalog, None),
+    ('get_categories', lambda: database.get_categories, None),
+    ('search_products', lambda: lambda: database.search_products('ekonomik'), None),
+    ('find_similar_products', lambda: lambda: database.find_similar_products('Ayran Organik 00140'), None),
+    ('add_product', lambda: lambda: database.add_product(BENCH_NAME), _delete_bench_products),
+    ('delete_product', lambda: lambda ids=_bench_products(1): database.delete_product(ids[0]), None),
+    (f'delete_products[{DELETE_BATCH}]',
+     lambda: lambda ids=_bench_products(DELETE_BATCH): database.delete_products(ids), None),
+    ('get_users', lambda: database.get_users, None),
+    ('add_user', lambda: lambda: database.add_user(BENCH_NAME, 'sifre'), _delete_bench_user),
+    ('update_user', lambda: lambda user_id=_bench_user(): database.update_user(user_id, can_view_reports=1),
+     _delete_bench_user),
+    ('delete_user', lambda: lambda user_id=_bench_user(): database.delete_user(user_id), None),
+    ('get_user_permissions', lambda: lambda: database.get_user_permissions(1), None),
+    ('check_user_permission', lambda: lambda: database.check_user_permission(1, 'can_view_reports'), None),
+    ('get_inventory', lambda: database.get_inventory, None),
+    ('get_inventory_report[month]', lambda: lambda: database.get_inventory_report(*MONTH), None),
+    ('get_latest_inventory_movements[100]', lambda: lambda: database.get_latest_inventory_movements(100), None),
+    ('get_movements_page[first]', lambda: lambda: database.get_movements_page(*YEAR, None, 20), None),
+    ('get_detailed_movements_report[month]', lambda: lambda: database.get_detailed_movements_report(*MONTH), None),
+    ('get_detailed_movements_report[year]', lambda: lambda: database.get_detailed_movements_report(*YEAR), None),
+    ('get_detailed_movements_preview[year]', lambda: lambda: database.get_detailed_movements_preview(*YEAR), None),
+    ('count_detailed_movements[year]', lambda: lambda: database.count_detailed_movements(*YEAR), None),
+    ('iter_detailed_movements_report[year]', _drain_case, None),
+    ('get_summary_report[month]', lambda: lambda: database.get_summary_report(*MONTH), None),
+    ('get_summary_report[year]', lambda: lambda: database.get_summary_report(*YEAR), None),
+    ('get_stock_as_of', lambda: lambda: database.get_stock_as_of('2024-06-15 12:00:00'), None),
+    ('get_closed_periods', lambda: database.get_closed_periods, None),
+    ('close_period', lambda: lambda: database.close_period(2024, 6, 1), lambda: _reopen_period('2024-06')),
+    ('add_inventory_movement', lambda: lambda: database.add_inventory_movement(1, 1, 'kg', 10, 1),
+     lambda: _delete_latest_movements(1)),
+    (f'add_inventory_movements_bulk[{DELIVERY_LINES}]',
+     lambda: lambda: database.add_inventory_movements_bulk(_movement_rows(DELIVERY_LINES), 1),
+     lambda: _delete_latest_movements(DELIVERY_LINES)),
+    ('delete_inventory_movement', _delete_case, None),
+    ('export_to_excel[month]', _export_case, None),
+    ('stream_to_excel[year]', lambda: _stream_case('stream_to_excel'), None),
+    ('stream_to_csv[year]', lambda: _stream_case('stream_to_csv'), None),
+]
+
+
+def run_case(setup, teardown, repeat):
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        cache.clear_caches()
+        func = setup()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+        rows = getattr(func, 'rows', None) or _count_rows(result)
+        if teardown:
+            teardown()
+
+    # Bellek zirvesi ayrı bir çalıştırmada ölçülür (tracemalloc yavaşlatır)
+    cache.clear_caches()
+    func = setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if teardown:
+        teardown()
+
+    median = statistics.median(timings)
+    return {
+        'min_ms': round(min(timings) * 1000, 3),
+        'median_ms': round(median * 1000, 3),
+        'peak_kb': round(peak / 1024, 1),
+        'rows': rows,
+        'rows_per_sec': round(rows / median, 1) if median and rows else None,
+    }
+
+
+def prepare_dataset(size, data_dir):
+    products, movements = DATASET_SIZES[size]
+    path = os.path.join(data_dir, f"bench_{size}.db")
+    database.DB_PATH = path
+    if not os.path.exists(path):
+        print(f"[{size}] veri seti üretiliyor: {products} ürün, {movements:,} hareket")
+        generate_dataset(products=products, movements=movements)
+    database.init_db()
+    return path
+
+
+def run(sizes, repeat, data_dir, only=None):
+    os.makedirs(data_dir, exist_ok=True)
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'repeat': repeat,
+        },
+        'results': {},
+    }
+    for size in sizes:
+        prepare_dataset(size, data_dir)
+        for name, setup, teardown in CASES:
+            if only and only not in name:
+                continue
+            stats = run_case(setup, teardown, repeat)
+            results['results'][f"{size}/{name}"] = stats
+            print(f"{size:7s} {name:45s} {stats['median_ms']:10.2f} ms  "
+                  f"{stats['peak_kb']:10.1f} KB  {stats['rows']:>9} satır")
+        database.close_pool()
+    return results
+
+
+def compare(old_path, new_path, threshold=REGRESSION_THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """İki çalıştırmayı karşılaştırır; eşikten fazla yavaşlayan ölçüm varsa 1 döner."""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)['results']
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)['results']
+
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key]['median_ms'], new[key]['median_ms']
+        ratio = after / before if before else float('inf')
+        flag = ''
+        if abs(after - before) < min_delta_ms:
+            pass
+        elif ratio > 1 + threshold:
+            flag = 'YAVAŞLAMA'
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = 'hızlanma'
+        print(f"{key:55s} {before:10.2f} -> {after:10.2f} ms  x{ratio:5.2f}  {flag}")
+    for key in sorted(set(new) - set(old)):
+        print(f"{key:55s} yeni ölçüm")
+    print(f"{regressions} yavaşlama (eşik %{threshold * 100:.0f})")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Veritabanı ve Excel dışa aktarım ölçümleri")
+    parser.add_argument("--sizes", default="small", help="Virgülle ayrılmış: " + ", ".join(DATASET_SIZES))
+    parser.add_argument("--repeat", type=int, default=5, help="Ölçüm tekrar sayısı")
+    parser.add_argument("--data-dir", default=".bench", help="Üretilen veri setlerinin klasörü")
+    parser.add_argument("--only", help="Yalnızca adı bu metni içeren ölçümler")
+    parser.add_argument("--output", help="Sonuçların yazılacağı JSON dosyası")
+    parser.add_argument("--compare", nargs=2, metavar=("ONCEKI", "SONRAKI"),
+                        help="İki sonuç dosyasını karşılaştır")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Yavaşlama eşiği (0.10 = %%10)")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS,
+                        help="Gürültü sayılacak en büyük fark (ms)")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, threshold=args.threshold, min_delta_ms=args.min_delta_ms))
+
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in sizes if s not in DATASET_SIZES]
+    if unknown:
+        parser.error(f"bilinmeyen boyut: {', '.join(unknown)}")
+
+    results = run(sizes, args.repeat, args.data_dir, only=args.only)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Sonuçlar yazıldı: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
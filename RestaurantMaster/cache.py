@@ -0,0 +1,215 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+# Rapor önbelleğinde tutulacak en fazla sonuç sayısı
+REPORT_CACHE_SIZE = 32
+# Hazırlanmış dışa aktarım dosyaları diskte tutulur; toplam boyut bu sınırı
+# aşınca en eski dosyalar silinir
+EXPORT_CACHE_BYTES = 256 * 1024 * 1024
+
+# Veri sürümü: database.py içindeki her yazma işleminden sonra artırılır.
+# Önbellek anahtarları bu sürümü içerdiğinden eski sonuçlar bir daha
+# okunmaz ve LRU sırasıyla dışarı atılır.
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def get_generation():
+    return _generation
+
+
+def bump_generation():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    return _generation
+
+
+class LRUCache:
+    """İş parçacığı güvenli, boyutu sınırlı LRU önbellek."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FileCache:
+    """İş parçacığı güvenli, dosyaları geçici bir dizinde saklayan ve toplam
+    boyutu sınırlı LRU önbellek. İçerik belleğe okunmaz; çağırana açık dosya
+    verilir."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.directory = None
+        self.size = 0
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, path, size):
+        self.size -= size
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def open(self, key):
+        """Saklanan dosyayı okumak üzere açar; yoksa None. Açık dosya önbellekten
+        silinse de sonuna kadar okunabilir, ancak disk alanı ancak dosya
+        kapatılınca boşalır; çağıran dosyayı kapatmalıdır."""
+        with self._lock:
+            entry = self._files.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._files.move_to_end(key)
+            self.hits += 1
+            return open(entry[0], 'rb')
+
+    def store(self, key, write):
+        """``write(dosya)`` ile üretilen içeriği saklar ve okumak üzere açar."""
+        with self._lock:
+            if self.directory is None:
+                self.directory = tempfile.mkdtemp(prefix='restaurant_exports_')
+        fd, path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with open(fd, 'wb') as f:
+                write(f)
+            result = open(path, 'rb')
+        except Exception:
+            os.remove(path)
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            if key in self._files:
+                self._remove(*self._files.pop(key))
+            self._files[key] = (path, size)
+            self.size += size
+            # Sınırdan büyük tek bir dosya da saklanmaz
+            while self.size > self.max_bytes:
+                self._remove(*self._files.popitem(last=False)[1])
+        return result
+
+    def clear(self):
+        with self._lock:
+            while self._files:
+                self._remove(*self._files.popitem()[1])
+
+    def close(self):
+        """Dosyaları ve geçici dizini siler."""
+        self.clear()
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def __len__(self):
+        return len(self._files)
+
+
+report_cache = LRUCache(REPORT_CACHE_SIZE)
+export_cache = FileCache(EXPORT_CACHE_BYTES)
+atexit.register(export_cache.close)
+
+_MISSING = object()
+
+
+def cached_report(name):
+    """Rapor fonksiyonunun sonucunu (rapor adı, parametreler, veri sürümü)
+    anahtarıyla önbelleğe alır. Sonuç DataFrame ise çağırana kopyası verilir."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())), get_generation())
+            result = report_cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = func(*args, **kwargs)
+                report_cache.set(key, result)
+            return result.copy() if hasattr(result, 'copy') else result
+        return wrapper
+    return decorator
+
+
+def cached_export(name, args, build):
+    """``build(dosya)`` ile yazılan dışa aktarım dosyasını (rapor adı,
+    parametreler, veri sürümü) anahtarıyla diskte saklar ve okumak üzere açık
+    dosyayı döndürür (``with`` ile kullanılmalıdır); aynı rapor tekrar
+    indirildiğinde yeniden oluşturulmaz."""
+    key = (name, args, get_generation())
+    output = export_cache.open(key)
+    if output is None:
+        output = export_cache.store(key, build)
+    return output
+
+
+# Referans tabloları (ürünler, kullanıcılar) süreç genelinde bir kez yüklenir
+# ve yalnızca ilgili tabloya yazıldığında yeniden okunur.
+_table_versions = {}
+_reference_data = {}
+_reference_lock = threading.Lock()
+
+
+def get_table_version(table):
+    return _table_versions.get(table, 0)
+
+
+def invalidate_table(table):
+    with _reference_lock:
+        _table_versions[table] = _table_versions.get(table, 0) + 1
+
+
+def cached_table(table):
+    """Tablo okuyan fonksiyonun sonucunu ``invalidate_table(table)`` çağrılana
+    kadar tüm oturumlar için saklar."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (table, func.__name__, args, tuple(sorted(kwargs.items())))
+            version = _table_versions.get(table, 0)
+            entry = _reference_data.get(key)
+            if entry is None or entry[0] != version:
+                entry = (version, func(*args, **kwargs))
+                _reference_data[key] = entry
+            result = entry[1]
+            return result.copy() if hasattr(result, 'copy') else result
+        return wrapper
+    return decorator
+
+
+def clear_caches():
+    """Tüm önbellekleri boşaltır (ölçümler ve testler için)."""
+    report_cache.clear()
+    export_cache.clear()
+    with _reference_lock:
+        _reference_data.clear()
@@ -1,6 +1,34 @@
-from database import init_db, add_product, add_inventory_movement, add_user
-from auth import hash_password
+import argparse
+import random
+import sqlite3
 import time
+from datetime import datetime, timedelta
+
+import database
+from database import init_db, add_product, add_inventory_movements_bulk, add_user, hash_password
+
+# Sentetik veri üretici ayarları: bölüm ağırlıkları, birimleri, birim fiyat
+# aralıkları (TL) ve temel ürün adları
+GENERATOR_CATEGORIES = {
+    "MUTFAK": (0.35, ["kg", "adet", "paket"], (15, 400),
+               ["Domates", "Patates", "Soğan", "Salatalık", "Biber", "Havuç", "Pirinç", "Makarna",
+                "Kıyma", "Tavuk", "Peynir", "Zeytinyağı", "Mercimek", "Bulgur", "Un"]),
+    "İÇECEK": (0.20, ["litre", "adet", "paket"], (10, 150),
+               ["Kola", "Fanta", "Meyve Suyu", "Gazoz", "Ayran", "Su", "Soda", "Çay", "Kahve"]),
+    "BAR": (0.12, ["litre", "ml", "adet"], (200, 3000),
+            ["Viski", "Votka", "Cin", "Rom", "Likör", "Tekila", "Rakı", "Şarap", "Bira"]),
+    "PASTA": (0.12, ["kg", "gram", "paket"], (20, 600),
+              ["Un", "Şeker", "Yumurta", "Kabartma Tozu", "Süt", "Krema", "Çikolata", "Tereyağı"]),
+    "DONDURMA": (0.08, ["kg", "kova"], (100, 900),
+                 ["Vanilya", "Çikolata", "Çilek", "Limon", "Fıstık", "Karamel"]),
+    "TEMİZLİK": (0.08, ["litre", "adet", "kova"], (20, 500),
+                 ["Sıvı Deterjan", "Çamaşır Suyu", "Yüzey Temizleyici", "Cam Temizleyici", "Eldiven"]),
+    "GENEL": (0.05, ["adet", "paket"], (5, 300),
+              ["Peçete", "Kürdan", "Streç Film", "Alüminyum Folyo", "Çöp Poşeti"]),
+}
+GENERATOR_VARIANTS = ["Ekonomik", "Premium", "Yerli", "İthal", "Organik", "Büyük Boy", "Küçük Boy"]
+GENERATOR_END_DATE = datetime(2025, 1, 1)
+GENERATOR_BATCH_SIZE = 50_000
 
 def create_demo_data():
     # Veritabanını başlat
@@ -34,7 +62,6 @@ def create_demo_data():
                 print(f"Eklendi: {product_name} - {department}")
             else:
                 print(f"Eklenemedi: {product_name} - Hata: {message}")
-            time.sleep(0.1)  # Kısa bir gecikme
     
     # Demo kullanıcılar oluştur
     users = [
@@ -78,23 +105,145 @@ def create_demo_data():
         {"product_name": "Çikolata", "quantity": 8, "unit": "kg", "price": 800}
     ]
     
-    for item in sample_inventory:
-        if item["product_name"] in product_ids:
-            product_id = product_ids[item["product_name"]]
-            success, message = add_inventory_movement(
-                product_id,
-                item["quantity"],
-                item["unit"],
-                item["price"],
-                admin_id
-            )
-            if success:
-                print(f"Stok hareketi eklendi: {item['product_name']} - {item['quantity']} {item['unit']}")
-            else:
-                print(f"Stok hareketi eklenemedi: {item['product_name']} - Hata: {message}")
-            time.sleep(0.1)  # Kısa bir gecikme
+    # Tüm hareketleri tek işlemde ekle
+    items = [item for item in sample_inventory if item["product_name"] in product_ids]
+    results = add_inventory_movements_bulk(
+        [
+            {
+                "product_id": product_ids[item["product_name"]],
+                "quantity": item["quantity"],
+                "unit": item["unit"],
+                "total_price": item["price"],
+            }
+            for item in items
+        ],
+        admin_id
+    )
+    for item, (success, message) in zip(items, results):
+        if success:
+            print(f"Stok hareketi eklendi: {item['product_name']} - {item['quantity']} {item['unit']}")
+        else:
+            print(f"Stok hareketi eklenemedi: {item['product_name']} - Hata: {message}")
     
     print("Demo veriler başarıyla oluşturuldu!")
 
+def generate_dataset(products=1000, movements=1_000_000, years=5, users=10, seed=42,
+                     end_date=GENERATOR_END_DATE, batch_size=GENERATOR_BATCH_SIZE):
+    """Performans çalışmaları için tekrarlanabilir (seed) büyük veri seti üretir.
+
+    Ürünler bölüm ağırlıklarına göre dağıtılır, hareketler popüler ürünlerde
+    yoğunlaşır (Zipf benzeri) ve ``years`` yıla kronolojik olarak yayılır.
+    Yükleme, senkronizasyon gevşetilmiş ayrı bir bağlantı üzerinden büyük
+    işlemlerle yapılır; boş bir veritabanı bekler.
+    """
+    init_db()
+    rng = random.Random(seed)
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")
+    try:
+        if conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]:
+            raise ValueError("Veri üretimi için boş bir veritabanı gerekir")
+
+        started = time.perf_counter()
+
+        # Kullanıcılar
+        password = hash_password("1234")
+        user_rows = [(f"personel_{idx:03d}", password, 0, rng.random() < 0.3, rng.random() < 0.3, 1)
+                     for idx in range(1, users + 1)]
+        conn.executemany("""INSERT INTO users
+                            (username, password, is_admin, can_add_product, can_view_reports, can_manage_inventory)
+                            VALUES (?, ?, ?, ?, ?, ?)""", user_rows)
+        user_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE can_manage_inventory = 1")]
+
+        # Ürünler: her ürünün sabit bir birimi ve lognormal dağılımlı birim fiyatı var
+        names = list(GENERATOR_CATEGORIES)
+        weights = [GENERATOR_CATEGORIES[name][0] for name in names]
+        catalogue = []
+        for idx in range(products):
+            category = rng.choices(names, weights)[0]
+            _, units, (low, high), bases = GENERATOR_CATEGORIES[category]
+            name = f"{rng.choice(bases)} {rng.choice(GENERATOR_VARIANTS)} {idx + 1:05d}"
+            unit_price = round(min(high, max(low, rng.lognormvariate(0, 0.6) * (low + high) / 4)), 2)
+            catalogue.append((name, category, rng.choice(units), unit_price))
+        conn.executemany("INSERT OR IGNORE INTO categories (name) VALUES (?)", [(name,) for name in names])
+        category_ids = dict(conn.execute("SELECT name, id FROM categories"))
+        conn.executemany("INSERT INTO products (name, category_id) VALUES (?, ?)",
+                         [(name, category_ids[category]) for name, category, _, _ in catalogue])
+        product_ids = [r[0] for r in conn.execute("SELECT id FROM products ORDER BY id")]
+        conn.commit()
+
+        # Popüler ürünler daha sık hareket görür
+        popularity = [1 / (rank + 1) ** 0.8 for rank in range(products)]
+        rng.shuffle(popularity)
+        cumulative = []
+        total = 0
+        for weight in popularity:
+            total += weight
+            cumulative.append(total)
+
+        start_date = end_date - timedelta(days=365 * years)
+        start_epoch = (start_date - datetime(1970, 1, 1)).total_seconds()
+        step = (end_date - start_date).total_seconds() / movements
+        written = 0
+        while written < movements:
+            count = min(batch_size, movements - written)
+            picks = rng.choices(range(products), cum_weights=cumulative, k=count)
+            batch = []
+            for offset, pick in enumerate(picks):
+                _, _, unit, unit_price = catalogue[pick]
+                quantity = round(rng.uniform(0.5, 40), 1)
+                total_price = round(quantity * unit_price * rng.uniform(0.9, 1.1), 2)
+                # Kronolojik akış, saniye düzeyinde rastgele sapmayla (UTC epoch)
+                moment = int(start_epoch + (written + offset + rng.random()) * step)
+                batch.append((product_ids[pick], quantity, unit, total_price, 'update',
+                               moment, rng.choice(user_ids)))
+            conn.executemany("""INSERT INTO inventory_movements
+                                (product_id, quantity_change, unit, total_price, movement_type, movement_date, user_id)
+                                VALUES (?, ?, ?, ?, ?, datetime(?, 'unixepoch'), ?)""", batch)
+            conn.commit()
+            written += count
+            elapsed = time.perf_counter() - started
+            print(f"{written:,}/{movements:,} hareket ({written / elapsed:,.0f} satır/sn)")
+
+        # Stok bakiyeleri hareketlerin toplamıdır
+        conn.execute("""INSERT INTO inventory (product_id, quantity, unit, total_price)
+                        SELECT product_id, SUM(quantity_change), MAX(unit), SUM(total_price)
+                        FROM inventory_movements
+                        GROUP BY product_id""")
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.commit()
+        print(f"Veri üretimi tamamlandı: {time.perf_counter() - started:.1f} sn")
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Demo veya büyük ölçekli sentetik veri oluşturur")
+    parser.add_argument("--db", help="Veritabanı dosyası (varsayılan: restaurant.db)")
+    parser.add_argument("--generate", action="store_true", help="Sentetik büyük veri seti üret")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Ölçek çarpanı: 1 = 1.000 ürün, 1.000.000 hareket")
+    parser.add_argument("--products", type=int, help="Ürün sayısı")
+    parser.add_argument("--movements", type=int, help="Hareket sayısı")
+    parser.add_argument("--years", type=int, default=5, help="Hareketlerin yayıldığı yıl sayısı")
+    parser.add_argument("--users", type=int, default=10, help="Personel sayısı")
+    parser.add_argument("--seed", type=int, default=42, help="Rastgele sayı tohumu")
+    args = parser.parse_args()
+
+    if args.db:
+        database.DB_PATH = args.db
+    if args.generate:
+        generate_dataset(
+            products=args.products or int(1000 * args.scale),
+            movements=args.movements or int(1_000_000 * args.scale),
+            years=args.years,
+            users=args.users,
+            seed=args.seed,
+        )
+    else:
+        create_demo_data()
+
 if __name__ == "__main__":
-    create_demo_data()
\ No newline at end of file
+    main()
\ No newline at end of file
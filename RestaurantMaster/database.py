@@ -1,267 +1,1069 @@
+import atexit
+import difflib
+import hashlib
+import math
+import os
+import queue
 import sqlite3
-import pandas as pd
-from datetime import datetime
+import sys
+import threading
+from contextlib import contextmanager
+
+from datetime import datetime, time, timedelta, timezone
+
+import profiling
+from cache import bump_generation, cached_report, cached_table, invalidate_table
+
+# Veritabanı dosyası ve bağlantı havuzu ayarları
+DB_PATH = os.environ.get('RESTAURANT_DB', 'restaurant.db')
+POOL_SIZE = int(os.environ.get('RESTAURANT_DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = 30
+
+# Hareket tarihleri saniye hassasiyetinde tutulur; bu saatten sonrası günü tamamlar
+DAY_END = time(23, 59, 59)
+
+# Her yeni bağlantıda bir kez uygulanan ayarlar
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+)
+
+
+class ConnectionPool:
+    """Yapılandırılmış SQLite bağlantılarını yeniden kullanan sınırlı havuz.
+
+    En fazla ``max_size`` bağlantı açılır; boşta kalan bağlantılar kapatılmadan
+    havuza geri döner, böylece her çağrıda bağlantı kurma ve PRAGMA maliyeti
+    ödenmez.
+    """
+
+    def __init__(self, path, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._all = []
+        self._pid = os.getpid()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               factory=profiling.connection_factory())
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def _check_fork(self):
+        # fork sonrası üst sürecin bağlantıları paylaşılmamalı
+        if self._pid != os.getpid():
+            with self._lock:
+                self._idle = queue.LifoQueue()
+                self._slots = threading.BoundedSemaphore(self.max_size)
+                self._all = []
+                self._pid = os.getpid()
+
+    def acquire(self):
+        self._check_fork()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("Veritabanı bağlantı havuzu dolu")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        if self._pid != os.getpid():
+            return
+        # Ölçüm ayarı değiştiyse eski sınıftaki bağlantı yeniden kullanılmaz
+        reusable = type(conn) is profiling.connection_factory()
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Bozulan bağlantıyı havuza geri koyma
+            reusable = False
+        try:
+            if reusable:
+                self._idle.put(conn)
+            else:
+                self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def drain_idle(self):
+        """Boştaki bağlantıları kapatır; kullanımdakiler havuza dönünce kapanır."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+    def close(self):
+        with self._lock:
+            conns, self._all = self._all, []
+            self._idle = queue.LifoQueue()
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None or _pool.path != DB_PATH:
+        with _pool_lock:
+            if _pool is None or _pool.path != DB_PATH:
+                if _pool is not None:
+                    _pool.close()
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def close_pool():
+    """Havuzdaki tüm bağlantıları kapatır (uygulama kapanırken çağrılır)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+atexit.register(close_pool)
 
-def init_db():
-    conn = sqlite3.connect('restaurant.db')
-    c = conn.cursor()
-
-    # Kullanıcılar tablosu
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (id INTEGER PRIMARY KEY,
-                  username TEXT UNIQUE NOT NULL,
-                  password TEXT NOT NULL,
-                  is_admin INTEGER DEFAULT 0,
-                  can_add_product INTEGER DEFAULT 0,
-                  can_view_reports INTEGER DEFAULT 0,
-                  can_manage_inventory INTEGER DEFAULT 0)''')
-
-    # Ürünler tablosu
-    c.execute('''CREATE TABLE IF NOT EXISTS products
-                 (id INTEGER PRIMARY KEY,
-                  name TEXT UNIQUE NOT NULL,
-                  category TEXT NOT NULL DEFAULT 'GENEL')''')
-
-    # Stok tablosu
-    c.execute('''CREATE TABLE IF NOT EXISTS inventory
-                 (id INTEGER PRIMARY KEY,
-                  product_id INTEGER NOT NULL,
-                  quantity REAL NOT NULL,
-                  unit TEXT NOT NULL,
-                  total_price REAL NOT NULL,
-                  last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  updated_by INTEGER,
-                  FOREIGN KEY (product_id) REFERENCES products (id),
-                  FOREIGN KEY (updated_by) REFERENCES users (id))''')
-
-    # Stok hareket tablosu
-    c.execute('''CREATE TABLE IF NOT EXISTS inventory_movements
-                 (id INTEGER PRIMARY KEY,
-                  product_id INTEGER NOT NULL,
-                  quantity_change REAL NOT NULL,
-                  unit TEXT NOT NULL,
-                  total_price REAL NOT NULL,
-                  movement_type TEXT NOT NULL,
-                  movement_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  user_id INTEGER,
-                  FOREIGN KEY (product_id) REFERENCES products (id),
-                  FOREIGN KEY (user_id) REFERENCES users (id))''')
-
-    conn.commit()
-    conn.close()
 
 def get_db():
-    conn = sqlite3.connect('restaurant.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Havuzdan bir bağlantı verir; ``with get_db() as conn:`` şeklinde kullanılır.
+
+    Blok sonunda commit edilmemiş işlem geri alınır ve bağlantı havuza döner.
+    Sorgu ölçümü açıksa bağlantı, çağıran fonksiyonun adıyla ölçülür.
+    """
+    if profiling.ENABLED:
+        return profiling.profiled(get_pool().connection(), sys._getframe(1).f_code.co_name)
+    return get_pool().connection()
+
+
+def set_profiling(enabled, sample_rate=None, slow_query_ms=None):
+    """Sorgu ölçümünü açar/kapatır ve havuzdaki bağlantıları yeni ayara geçirir."""
+    profiling.configure(enabled=enabled, sample_rate=sample_rate, slow_query_ms=slow_query_ms)
+    if _pool is not None:
+        _pool.drain_idle()
+
+
+def _read_frame(query, conn, params=None):
+    """Sorgu sonucunu DataFrame olarak döndürür. pandas yalnızca bu yol ilk
+    kullanıldığında yüklenir; satır döndüren fonksiyonlar ve yönetim betikleri
+    onu hiç içe aktarmaz."""
+    import pandas as pd
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def fetch_rows(query, params=()):
+    """Sorgu sonucunu pandas'a ihtiyaç duymadan ``sqlite3.Row`` listesi olarak
+    döndürür (yönetim betikleri ve CLI araçları için)."""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        rows = c.fetchall()
+        c.close()
+        return rows
+
+
+# Ürün aramasında Türkçe harf katlaması: büyük/küçük harf (İ/I/ı/i dahil) ve
+# şapkalı/noktalı harf farkları yok sayılır. Aynı eşleme sorgularda Python'da,
+# arama dizininde SQL'de uygulanır; SQL tarafı başka istemcilerin yazdığı
+# satırlarda da çalışsın diye yalnızca yerleşik fonksiyonlarla kurulur.
+SEARCH_FOLD = {
+    'İ': 'i', 'I': 'i', 'ı': 'i', 'Î': 'i', 'î': 'i',
+    'Ş': 's', 'ş': 's', 'Ğ': 'g', 'ğ': 'g', 'Ç': 'c', 'ç': 'c',
+    'Ü': 'u', 'ü': 'u', 'Û': 'u', 'û': 'u', 'Ö': 'o', 'ö': 'o',
+    'Â': 'a', 'â': 'a',
+}
+# SQLite lower() yalnızca ASCII harfleri küçültür; Python tarafı da öyle yapar
+_SEARCH_FOLD_TABLE = str.maketrans({
+    **{chr(code): chr(code + 32) for code in range(ord('A'), ord('Z') + 1)},
+    **SEARCH_FOLD,
+})
+
+
+def fold_search_text(text):
+    return (text or '').translate(_SEARCH_FOLD_TABLE)
+
+
+def _fold_sql(expr):
+    for source, target in SEARCH_FOLD.items():
+        expr = f"replace({expr}, '{source}', '{target}')"
+    return f"lower({expr})"
+
+
+# Şema göçleri: sıra önemlidir, her eleman bir sürümdür (1'den başlar).
+# Bir adım SQL cümlesi ya da bağlantı alan bir fonksiyon olabilir.
+# Yayınlanmış bir göç değiştirilmez; yeni değişiklikler listenin sonuna eklenir.
+MIGRATIONS = [
+    # 1: Temel şema
+    (
+        # Kullanıcılar tablosu
+        '''CREATE TABLE IF NOT EXISTS users
+           (id INTEGER PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            is_admin INTEGER DEFAULT 0,
+            can_add_product INTEGER DEFAULT 0,
+            can_view_reports INTEGER DEFAULT 0,
+            can_manage_inventory INTEGER DEFAULT 0)''',
+
+        # Ürünler tablosu
+        '''CREATE TABLE IF NOT EXISTS products
+           (id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            category TEXT NOT NULL DEFAULT 'GENEL')''',
+
+        # Stok tablosu
+        '''CREATE TABLE IF NOT EXISTS inventory
+           (id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            unit TEXT NOT NULL,
+            total_price REAL NOT NULL,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_by INTEGER,
+            FOREIGN KEY (product_id) REFERENCES products (id),
+            FOREIGN KEY (updated_by) REFERENCES users (id))''',
+
+        # Stok hareket tablosu
+        '''CREATE TABLE IF NOT EXISTS inventory_movements
+           (id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            quantity_change REAL NOT NULL,
+            unit TEXT NOT NULL,
+            total_price REAL NOT NULL,
+            movement_type TEXT NOT NULL,
+            movement_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            FOREIGN KEY (product_id) REFERENCES products (id),
+            FOREIGN KEY (user_id) REFERENCES users (id))''',
+    ),
+    # 2: Rapor ve stok sorguları için indeksler
+    (
+        # Aynı ürün için birden fazla stok satırı varsa en eski satırda birleştir
+        '''UPDATE inventory
+           SET quantity = (SELECT SUM(i2.quantity) FROM inventory i2
+                           WHERE i2.product_id = inventory.product_id),
+               total_price = (SELECT SUM(i2.total_price) FROM inventory i2
+                              WHERE i2.product_id = inventory.product_id)
+           WHERE id IN (SELECT MIN(id) FROM inventory
+                        GROUP BY product_id HAVING COUNT(*) > 1)''',
+        '''DELETE FROM inventory
+           WHERE id NOT IN (SELECT MIN(id) FROM inventory GROUP BY product_id)''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_inventory_product ON inventory (product_id)",
+        # Tarih aralığı ve son hareketler sorguları
+        "CREATE INDEX IF NOT EXISTS idx_movements_date ON inventory_movements (movement_date)",
+        # Ürün bazlı raporlar ve ürün silme
+        "CREATE INDEX IF NOT EXISTS idx_movements_product_date ON inventory_movements (product_id, movement_date)",
+    ),
+    # 3: Özet raporlar için günlük toplam tablosu (tetikleyicilerle güncel tutulur)
+    (
+        '''CREATE TABLE IF NOT EXISTS movement_daily_rollup
+           (day TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            unit TEXT NOT NULL,
+            qty REAL NOT NULL DEFAULT 0,
+            value REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, product_id, unit)) WITHOUT ROWID''',
+        '''INSERT INTO movement_daily_rollup (day, product_id, unit, qty, value, count)
+           SELECT substr(movement_date, 1, 10), product_id, unit,
+                  SUM(quantity_change), SUM(total_price), COUNT(*)
+           FROM inventory_movements
+           GROUP BY 1, 2, 3''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_movements_rollup_insert
+           AFTER INSERT ON inventory_movements
+           BEGIN
+               INSERT INTO movement_daily_rollup (day, product_id, unit, qty, value, count)
+               VALUES (substr(NEW.movement_date, 1, 10), NEW.product_id, NEW.unit,
+                       NEW.quantity_change, NEW.total_price, 1)
+               ON CONFLICT (day, product_id, unit) DO UPDATE
+               SET qty = qty + excluded.qty,
+                   value = value + excluded.value,
+                   count = count + 1;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_movements_rollup_delete
+           AFTER DELETE ON inventory_movements
+           BEGIN
+               UPDATE movement_daily_rollup
+               SET qty = qty - OLD.quantity_change,
+                   value = value - OLD.total_price,
+                   count = count - 1
+               WHERE day = substr(OLD.movement_date, 1, 10)
+                 AND product_id = OLD.product_id AND unit = OLD.unit;
+               DELETE FROM movement_daily_rollup
+               WHERE day = substr(OLD.movement_date, 1, 10)
+                 AND product_id = OLD.product_id AND unit = OLD.unit
+                 AND count <= 0;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_movements_rollup_update
+           AFTER UPDATE OF product_id, quantity_change, unit, total_price, movement_date
+           ON inventory_movements
+           BEGIN
+               UPDATE movement_daily_rollup
+               SET qty = qty - OLD.quantity_change,
+                   value = value - OLD.total_price,
+                   count = count - 1
+               WHERE day = substr(OLD.movement_date, 1, 10)
+                 AND product_id = OLD.product_id AND unit = OLD.unit;
+               DELETE FROM movement_daily_rollup
+               WHERE day = substr(OLD.movement_date, 1, 10)
+                 AND product_id = OLD.product_id AND unit = OLD.unit
+                 AND count <= 0;
+               INSERT INTO movement_daily_rollup (day, product_id, unit, qty, value, count)
+               VALUES (substr(NEW.movement_date, 1, 10), NEW.product_id, NEW.unit,
+                       NEW.quantity_change, NEW.total_price, 1)
+               ON CONFLICT (day, product_id, unit) DO UPDATE
+               SET qty = qty + excluded.qty,
+                   value = value + excluded.value,
+                   count = count + 1;
+           END''',
+    ),
+    # 4: Dönem kapanışları ve kapanış stok bakiyeleri
+    (
+        # boundary: dönemden sonraki ilk an (hariç), UTC; ör. UTC+3'te 2024-03 için
+        # '2024-03-31 21:00:00' (ilk sürümde kaydedilenler gün: 2024-04-01)
+        '''CREATE TABLE IF NOT EXISTS stock_periods
+           (period TEXT PRIMARY KEY,
+            boundary TEXT NOT NULL UNIQUE,
+            closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            closed_by INTEGER,
+            FOREIGN KEY (closed_by) REFERENCES users (id))''',
+        '''CREATE TABLE IF NOT EXISTS stock_snapshots
+           (period TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            unit TEXT NOT NULL,
+            quantity REAL NOT NULL DEFAULT 0,
+            value REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, product_id, unit)) WITHOUT ROWID''',
+        # Kapanmış bir döneme düşen hareket eklenir/silinirse sonraki tüm
+        # kapanış bakiyeleri aynı işlemde düzeltilir
+        '''CREATE TRIGGER IF NOT EXISTS trg_movements_snapshot_insert
+           AFTER INSERT ON inventory_movements
+           BEGIN
+               INSERT INTO stock_snapshots (period, product_id, unit, quantity, value)
+               SELECT period, NEW.product_id, NEW.unit, NEW.quantity_change, NEW.total_price
+               FROM stock_periods
+               WHERE boundary > NEW.movement_date
+               ON CONFLICT (period, product_id, unit) DO UPDATE
+               SET quantity = quantity + excluded.quantity,
+                   value = value + excluded.value;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_movements_snapshot_delete
+           AFTER DELETE ON inventory_movements
+           BEGIN
+               INSERT INTO stock_snapshots (period, product_id, unit, quantity, value)
+               SELECT period, OLD.product_id, OLD.unit, -OLD.quantity_change, -OLD.total_price
+               FROM stock_periods
+               WHERE boundary > OLD.movement_date
+               ON CONFLICT (period, product_id, unit) DO UPDATE
+               SET quantity = quantity + excluded.quantity,
+                   value = value + excluded.value;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_movements_snapshot_update
+           AFTER UPDATE OF product_id, quantity_change, unit, total_price, movement_date
+           ON inventory_movements
+           BEGIN
+               INSERT INTO stock_snapshots (period, product_id, unit, quantity, value)
+               SELECT period, OLD.product_id, OLD.unit, -OLD.quantity_change, -OLD.total_price
+               FROM stock_periods
+               WHERE boundary > OLD.movement_date
+               ON CONFLICT (period, product_id, unit) DO UPDATE
+               SET quantity = quantity + excluded.quantity,
+                   value = value + excluded.value;
+               INSERT INTO stock_snapshots (period, product_id, unit, quantity, value)
+               SELECT period, NEW.product_id, NEW.unit, NEW.quantity_change, NEW.total_price
+               FROM stock_periods
+               WHERE boundary > NEW.movement_date
+               ON CONFLICT (period, product_id, unit) DO UPDATE
+               SET quantity = quantity + excluded.quantity,
+                   value = value + excluded.value;
+           END''',
+    ),
+    # 5: Ürün arama dizini (FTS5 trigram, katlanmış ad ve bölüm; rowid = ürün id)
+    (
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS product_search
+           USING fts5(name, category, tokenize = 'trigram')''',
+        f'''INSERT INTO product_search (rowid, name, category)
+            SELECT id, {_fold_sql('name')}, {_fold_sql('category')} FROM products''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_products_search_insert
+            AFTER INSERT ON products
+            BEGIN
+                INSERT INTO product_search (rowid, name, category)
+                VALUES (NEW.id, {_fold_sql('NEW.name')}, {_fold_sql('NEW.category')});
+            END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_products_search_delete
+           AFTER DELETE ON products
+           BEGIN
+               DELETE FROM product_search WHERE rowid = OLD.id;
+           END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_products_search_update
+            AFTER UPDATE OF id, name, category ON products
+            BEGIN
+                DELETE FROM product_search WHERE rowid = OLD.id;
+                INSERT INTO product_search (rowid, name, category)
+                VALUES (NEW.id, {_fold_sql('NEW.name')}, {_fold_sql('NEW.category')});
+            END''',
+    ),
+    # 6: Bölümler ayrı tabloya taşınır; ürünler bölüme tamsayı anahtarla bağlanır
+    (
+        '''CREATE TABLE IF NOT EXISTS categories
+           (id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL)''',
+        '''INSERT OR IGNORE INTO categories (name)
+           SELECT name FROM (
+               SELECT 'BAR' AS name UNION SELECT 'DONDURMA' UNION SELECT 'GENEL'
+               UNION SELECT 'İÇECEK' UNION SELECT 'MUTFAK' UNION SELECT 'PASTA'
+               UNION SELECT 'TEMİZLİK'
+               UNION SELECT category FROM products
+           ) ORDER BY name''',
+        # Ürün tablosu yeniden kurulur (ürün id'leri korunur)
+        'DROP TRIGGER IF EXISTS trg_products_search_insert',
+        'DROP TRIGGER IF EXISTS trg_products_search_delete',
+        'DROP TRIGGER IF EXISTS trg_products_search_update',
+        '''CREATE TABLE products_new
+           (id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            category_id INTEGER NOT NULL,
+            FOREIGN KEY (category_id) REFERENCES categories (id))''',
+        '''INSERT INTO products_new (id, name, category_id)
+           SELECT p.id, p.name, c.id
+           FROM products p
+           JOIN categories c ON c.name = p.category''',
+        'DROP TABLE products',
+        'ALTER TABLE products_new RENAME TO products',
+        'CREATE INDEX IF NOT EXISTS idx_products_category ON products (category_id)',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_products_search_insert
+            AFTER INSERT ON products
+            BEGIN
+                INSERT INTO product_search (rowid, name, category)
+                VALUES (NEW.id, {_fold_sql('NEW.name')},
+                        (SELECT {_fold_sql('name')} FROM categories WHERE id = NEW.category_id));
+            END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_products_search_delete
+           AFTER DELETE ON products
+           BEGIN
+               DELETE FROM product_search WHERE rowid = OLD.id;
+           END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_products_search_update
+            AFTER UPDATE OF id, name, category_id ON products
+            BEGIN
+                DELETE FROM product_search WHERE rowid = OLD.id;
+                INSERT INTO product_search (rowid, name, category)
+                VALUES (NEW.id, {_fold_sql('NEW.name')},
+                        (SELECT {_fold_sql('name')} FROM categories WHERE id = NEW.category_id));
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_categories_search_update
+            AFTER UPDATE OF name ON categories
+            BEGIN
+                UPDATE product_search SET category = {_fold_sql('NEW.name')}
+                WHERE rowid IN (SELECT id FROM products WHERE category_id = NEW.id);
+            END''',
+    ),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Bu süreçte göçleri tamamlanmış veritabanı dosyaları
+_migrated_paths = set()
+_migrate_lock = threading.Lock()
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Bekleyen göçleri sırayla uygular ve uygulanan göç sayısını döndürür.
+
+    Her göç kendi işleminde çalışır; ``BEGIN IMMEDIATE`` aynı dosyayı açan
+    diğer süreçlerin aynı göçü iki kez uygulamasını engeller.
+    """
+    applied = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                return applied
+            for step in MIGRATIONS[version]:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+            applied += 1
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def init_db():
+    """Veritabanı şemasını günceller; süreç başına dosya başına bir kez çalışır."""
+    path = DB_PATH
+    if path in _migrated_paths:
+        return
+    with _migrate_lock:
+        if path in _migrated_paths:
+            return
+        with get_db() as conn:
+            if get_schema_version(conn) < SCHEMA_VERSION:
+                migrate(conn)
+        _migrated_paths.add(path)
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
 
 def add_user(username, password, is_admin=0, can_add_product=0, can_view_reports=0, can_manage_inventory=0):
     if not username or not password:
         return False, "Kullanıcı adı ve şifre boş olamaz"
 
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        c.execute("""INSERT INTO users 
-                    (username, password, is_admin, can_add_product, can_view_reports, can_manage_inventory) 
-                    VALUES (?, ?, ?, ?, ?, ?)""",
-                 (username, password, is_admin, can_add_product, can_view_reports, can_manage_inventory))
-        conn.commit()
-        return True, "Kullanıcı başarıyla eklendi"
-    except sqlite3.IntegrityError:
-        return False, "Bu kullanıcı adı zaten kullanılıyor"
-    except Exception as e:
-        return False, f"Beklenmeyen bir hata oluştu: {str(e)}"
-    finally:
-        conn.close()
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("""INSERT INTO users 
+                        (username, password, is_admin, can_add_product, can_view_reports, can_manage_inventory) 
+                        VALUES (?, ?, ?, ?, ?, ?)""",
+                     (username, password, is_admin, can_add_product, can_view_reports, can_manage_inventory))
+            conn.commit()
+            bump_generation()
+            invalidate_table('users')
+            return True, "Kullanıcı başarıyla eklendi"
+        except sqlite3.IntegrityError:
+            return False, "Bu kullanıcı adı zaten kullanılıyor"
+        except Exception as e:
+            return False, f"Beklenmeyen bir hata oluştu: {str(e)}"
 
 def update_user(user_id, password=None, is_admin=None, can_add_product=None, can_view_reports=None, can_manage_inventory=None):
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        updates = []
-        params = []
-        if password is not None:
-            updates.append("password = ?")
-            params.append(password)
-        if is_admin is not None:
-            updates.append("is_admin = ?")
-            params.append(is_admin)
-        if can_add_product is not None:
-            updates.append("can_add_product = ?")
-            params.append(can_add_product)
-        if can_view_reports is not None:
-            updates.append("can_view_reports = ?")
-            params.append(can_view_reports)
-        if can_manage_inventory is not None:
-            updates.append("can_manage_inventory = ?")
-            params.append(can_manage_inventory)
-
-        if not updates:
-            return False, "Güncellenecek alan belirtilmedi"
-
-        query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
-        params.append(user_id)
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            updates = []
+            params = []
+            if password is not None:
+                updates.append("password = ?")
+                params.append(password)
+            if is_admin is not None:
+                updates.append("is_admin = ?")
+                params.append(is_admin)
+            if can_add_product is not None:
+                updates.append("can_add_product = ?")
+                params.append(can_add_product)
+            if can_view_reports is not None:
+                updates.append("can_view_reports = ?")
+                params.append(can_view_reports)
+            if can_manage_inventory is not None:
+                updates.append("can_manage_inventory = ?")
+                params.append(can_manage_inventory)
 
-        c.execute(query, params)
-        conn.commit()
-        return True, "Kullanıcı başarıyla güncellendi"
-    except Exception as e:
-        return False, f"Güncelleme sırasında hata oluştu: {str(e)}"
-    finally:
-        conn.close()
+            if not updates:
+                return False, "Güncellenecek alan belirtilmedi"
+
+            query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
+            params.append(user_id)
+
+            c.execute(query, params)
+            conn.commit()
+            bump_generation()
+            invalidate_table('users')
+            return True, "Kullanıcı başarıyla güncellendi"
+        except Exception as e:
+            return False, f"Güncelleme sırasında hata oluştu: {str(e)}"
 
+@cached_table('users')
 def get_users():
-    conn = get_db()
-    df = pd.read_sql_query("""
-        SELECT id, username, is_admin, can_add_product, can_view_reports, can_manage_inventory 
-        FROM users
-        ORDER BY username
-    """, conn)
-    conn.close()
-    return df
+    with get_db() as conn:
+        df = _read_frame("""
+            SELECT id, username, is_admin, can_add_product, can_view_reports, can_manage_inventory 
+            FROM users
+            ORDER BY username
+        """, conn)
+        return df
 
 def delete_user(user_id):
     if not user_id:
         return False, "Geçersiz kullanıcı ID'si"
     
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        # Admin kontrolü
-        c.execute("SELECT COUNT(*) FROM users WHERE is_admin = 1")
-        admin_count = c.fetchone()[0]
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            # Admin kontrolü
+            c.execute("SELECT COUNT(*) FROM users WHERE is_admin = 1")
+            admin_count = c.fetchone()[0]
         
-        c.execute("SELECT is_admin FROM users WHERE id = ?", (user_id,))
-        user = c.fetchone()
+            c.execute("SELECT is_admin FROM users WHERE id = ?", (user_id,))
+            user = c.fetchone()
         
-        if user and user[0] and admin_count <= 1:
-            return False, "Son admin kullanıcısı silinemez"
+            if user and user[0] and admin_count <= 1:
+                return False, "Son admin kullanıcısı silinemez"
             
-        c.execute("DELETE FROM users WHERE id = ?", (user_id,))
-        if c.rowcount == 0:
-            return False, "Kullanıcı bulunamadı"
+            c.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            if c.rowcount == 0:
+                return False, "Kullanıcı bulunamadı"
             
-        conn.commit()
-        return True, "Kullanıcı başarıyla silindi"
-    except Exception as e:
-        return False, f"Kullanıcı silinirken hata oluştu: {str(e)}"
-    finally:
-        conn.close()
+            conn.commit()
+            bump_generation()
+            invalidate_table('users')
+            return True, "Kullanıcı başarıyla silindi"
+        except Exception as e:
+            return False, f"Kullanıcı silinirken hata oluştu: {str(e)}"
 
-def check_user_permission(user_id, permission):
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        c.execute(f"SELECT {permission} FROM users WHERE id = ?", (user_id,))
+# Yetkiler oturum başına tek sorguyla bit maskesi olarak yüklenir
+PERMISSIONS = ('is_admin', 'can_add_product', 'can_view_reports', 'can_manage_inventory')
+PERMISSION_BITS = {name: 1 << idx for idx, name in enumerate(PERMISSIONS)}
+
+def get_user_permissions(user_id):
+    """Kullanıcının tüm yetkilerini bit maskesi olarak döndürür (bulunamazsa 0)."""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT {', '.join(PERMISSIONS)} FROM users WHERE id = ?", (user_id,))
         result = c.fetchone()
-        return bool(result[0]) if result else False
-    finally:
-        conn.close()
+    if not result:
+        return 0
+    return sum(PERMISSION_BITS[name] for name in PERMISSIONS if result[name])
+
+def check_user_permission(user_id, permission):
+    if permission not in PERMISSION_BITS:
+        raise ValueError(f"Bilinmeyen yetki: {permission}")
+    return bool(get_user_permissions(user_id) & PERMISSION_BITS[permission])
+
+def _resolve_category(c, category):
+    """Bölüm id'si ya da adı alır, id döndürür; bilinmeyen ad yeni bölüm olarak
+    eklenir. İkinci değer yeni bölüm eklenip eklenmediğidir."""
+    if isinstance(category, int):
+        return category, False
+    c.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,))
+    created = c.rowcount > 0
+    c.execute("SELECT id FROM categories WHERE name = ?", (category,))
+    return c.fetchone()[0], created
 
 def add_product(name, category="GENEL"):
+    """Ürün ekler; ``category`` bölüm id'si ya da adı olabilir."""
     if not name:
         return False, "Ürün adı boş olamaz"
 
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO products (name, category) VALUES (?, ?)", (name, category))
-        product_id = c.lastrowid
-        conn.commit()
-        return True, f"Ürün başarıyla eklendi. ID: {product_id}"
-    except sqlite3.IntegrityError:
-        return False, "Bu ürün zaten tanımlı"
-    except Exception as e:
-        return False, f"Beklenmeyen bir hata oluştu: {str(e)}"
-    finally:
-        conn.close()
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            category_id, created = _resolve_category(c, category)
+            c.execute("INSERT INTO products (name, category_id) VALUES (?, ?)", (name, category_id))
+            product_id = c.lastrowid
+            conn.commit()
+            bump_generation()
+            invalidate_table('products')
+            if created:
+                invalidate_table('categories')
+            return True, f"Ürün başarıyla eklendi. ID: {product_id}"
+        except sqlite3.IntegrityError:
+            return False, "Bu ürün zaten tanımlı"
+        except Exception as e:
+            return False, f"Beklenmeyen bir hata oluştu: {str(e)}"
 
+@cached_table('products')
 def get_products():
-    conn = get_db()
-    df = pd.read_sql_query("SELECT * FROM products ORDER BY name", conn)
-    conn.close()
-    return df
+    with get_db() as conn:
+        df = _read_frame("""
+            SELECT p.id, p.name, p.category_id, c.name AS category
+            FROM products p
+            JOIN categories c ON c.id = p.category_id
+            ORDER BY p.name
+        """, conn)
+        return df
+
+@cached_table('categories')
+def get_categories():
+    """Bölümler: [(id, ad)] ada göre sıralı."""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, name FROM categories ORDER BY name")
+        return c.fetchall()
+
+# Arama sonuçları ve benzer ürün kontrolü ayarları
+SEARCH_LIMIT = 20
+NEAR_DUPLICATE_RATIO = 0.85
+_NEAR_DUPLICATE_CANDIDATES = 50
+
+def _like_pattern(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def search_products(query, limit=SEARCH_LIMIT):
+    """Ürün adı ve bölümünde Türkçe harf ve büyük/küçük harf duyarsız arama.
+
+    Her kelime adın ya da bölümün herhangi bir yerinde geçmelidir. Üç ve daha
+    uzun kelimeler trigram dizininden, daha kısalar dizin tablosunun taranmasıyla
+    eşleştirilir. Adı aranan metinle başlayan ürünler önce gelir.
+
+    Returns:
+        [(id, ad, bölüm)]
+    """
+    terms = fold_search_text(query).split()
+    if not terms:
+        return []
+    conditions = []
+    params = []
+    long_terms = [term for term in terms if len(term) >= 3]
+    if long_terms:
+        conditions.append("product_search MATCH ?")
+        params.append(' AND '.join('"' + term.replace('"', '""') + '"' for term in long_terms))
+    for term in terms:
+        if len(term) < 3:
+            conditions.append("(s.name LIKE ? ESCAPE '\\' OR s.category LIKE ? ESCAPE '\\')")
+            params.extend([_like_pattern(term)] * 2)
+
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT p.id, p.name, cat.name
+            FROM product_search s
+            JOIN products p ON p.id = s.rowid
+            JOIN categories cat ON cat.id = p.category_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY instr(s.name, ?) = 1 DESC, instr(s.name, ?) > 0 DESC,
+                     length(p.name), p.name
+            LIMIT ?
+        """, params + [terms[0], terms[0], limit])
+        return c.fetchall()
+
+def find_similar_products(name, limit=5, threshold=NEAR_DUPLICATE_RATIO):
+    """Eklenmek istenen ada yazım olarak çok benzeyen ürünleri bulur
+    (ör. "Domates" / "DOMATES" / "Domatse").
+
+    Adaylar adın trigramlarından biriyle eşleşen ürünlerdir; katlanmış adlar
+    arasındaki benzerlik ``threshold`` değerini geçenler döndürülür.
+
+    Returns:
+        [(id, ad, bölüm)] en benzer önce
+    """
+    folded = ' '.join(fold_search_text(name).split())
+    if not folded:
+        return []
+    if len(folded) < 3:
+        candidates = search_products(folded, _NEAR_DUPLICATE_CANDIDATES)
+    else:
+        trigrams = sorted({folded[i:i + 3] for i in range(len(folded) - 2)})
+        with get_db() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT p.id, p.name, cat.name
+                FROM product_search s
+                JOIN products p ON p.id = s.rowid
+                JOIN categories cat ON cat.id = p.category_id
+                WHERE product_search MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            """, ('name : (' + ' OR '.join('"' + gram.replace('"', '""') + '"' for gram in trigrams) + ')',
+                  _NEAR_DUPLICATE_CANDIDATES))
+            candidates = c.fetchall()
+
+    scored = []
+    for product_id, product_name, category in candidates:
+        ratio = difflib.SequenceMatcher(None, folded, fold_search_text(product_name)).ratio()
+        if ratio >= threshold:
+            scored.append((ratio, product_id, product_name, category))
+    scored.sort(key=lambda item: (-item[0], item[2]))
+    return [(product_id, product_name, category) for _, product_id, product_name, category in scored[:limit]]
+
+class ProductCatalog:
+    """Ürünlerin id → ad/bölüm ve ad → id sözlükleri.
+
+    Ürün tablosu değişene kadar tüm oturumlarca paylaşılır; değiştirilmemelidir.
+    Seçim kutularındaki ``format_func`` gibi sık aramalar O(1) çalışır.
+    Bölümler tamsayı id'leriyle tutulur.
+    """
+
+    def __init__(self, rows):
+        # rows: (id, ad, bölüm id, bölüm adı), ada göre sıralı
+        self.ids = [row[0] for row in rows]
+        self.names = {row[0]: row[1] for row in rows}
+        self.category_ids = {row[0]: row[2] for row in rows}
+        self.category_names = {row[2]: row[3] for row in rows}
+        self.ids_by_name = {row[1]: row[0] for row in rows}
+        self._ids_by_category = {}
+        for product_id, _, category_id, _ in rows:
+            self._ids_by_category.setdefault(category_id, []).append(product_id)
+        # Ürünü olan bölümler, ada göre sıralı
+        self.categories = sorted(self._ids_by_category, key=self.category_names.get)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, product_id):
+        return product_id in self.names
+
+    def name(self, product_id):
+        return self.names.get(product_id, '')
+
+    def category(self, product_id):
+        """Ürünün bölüm adı."""
+        return self.category_names.get(self.category_ids.get(product_id))
+
+    def category_name(self, category_id):
+        return self.category_names.get(category_id, '')
+
+    def id_for(self, name):
+        return self.ids_by_name.get(name)
+
+    def ids_in(self, category_id):
+        """Bölümdeki ürün id'leri (ada göre sıralı)."""
+        return self._ids_by_category.get(category_id, [])
+
+@cached_table('products')
+def get_product_catalog():
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT p.id, p.name, p.category_id, cat.name
+            FROM products p
+            JOIN categories cat ON cat.id = p.category_id
+            ORDER BY p.name
+        """)
+        return ProductCatalog(c.fetchall())
+
+# Stok bakiyesini ürün başına tek satırda tutar (inventory.product_id UNIQUE)
+INVENTORY_UPSERT = """
+    INSERT INTO inventory (product_id, quantity, unit, total_price, updated_by)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (product_id) DO UPDATE
+    SET quantity = quantity + excluded.quantity,
+        unit = excluded.unit,
+        total_price = total_price + excluded.total_price,
+        last_updated = CURRENT_TIMESTAMP,
+        updated_by = excluded.updated_by
+"""
 
 def add_inventory_movement(product_id, quantity, unit, total_price, user_id):
     if not product_id or not unit or total_price < 0:
         return False, "Lütfen tüm alanları doğru şekilde doldurun"
 
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        # Önce stok kaydını kontrol et/güncelle
-        c.execute("SELECT id FROM inventory WHERE product_id = ?", (product_id,))
-        inv_record = c.fetchone()
-
-        if inv_record:
-            c.execute("""UPDATE inventory 
-                        SET quantity = quantity + ?,
-                            unit = ?,
-                            total_price = total_price + ?,
-                            last_updated = CURRENT_TIMESTAMP,
-                            updated_by = ?
-                        WHERE product_id = ?""",
-                     (quantity, unit, total_price, user_id, product_id))
-        else:
-            c.execute("""INSERT INTO inventory 
-                        (product_id, quantity, unit, total_price, updated_by)
-                        VALUES (?, ?, ?, ?, ?)""",
-                     (product_id, quantity, unit, total_price, user_id))
-
-        # Hareket kaydı ekle
-        c.execute("""INSERT INTO inventory_movements 
-                    (product_id, quantity_change, unit, total_price, movement_type, user_id)
-                    VALUES (?, ?, ?, ?, ?, ?)""",
-                 (product_id, quantity, unit, total_price, 'update', user_id))
-
-        conn.commit()
-        return True, "Stok başarıyla güncellendi"
-    except sqlite3.IntegrityError:
-        return False, "Ürün veya kullanıcı bulunamadı"
-    except Exception as e:
-        return False, f"Beklenmeyen bir hata oluştu: {str(e)}"
-    finally:
-        conn.close()
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            # Stok kaydını tek cümlede ekle/güncelle
+            c.execute(INVENTORY_UPSERT, (product_id, quantity, unit, total_price, user_id))
 
-def get_inventory_report(start_date, end_date):
-    conn = get_db()
-    query = """
-    SELECT 
-        p.name as product_name,
-        i.unit,
-        i.total_price,
-        i.quantity as current_quantity,
-        SUM(im.quantity_change) as total_movement,
-        COUNT(im.id) as movement_count,
-        i.total_price as total_value
-    FROM products p
-    LEFT JOIN inventory i ON p.id = i.product_id
-    LEFT JOIN inventory_movements im ON p.id = im.product_id
-    AND im.movement_date BETWEEN ? AND ?
-    GROUP BY p.id
-    ORDER BY p.name
+            # Hareket kaydı ekle
+            c.execute("""INSERT INTO inventory_movements 
+                        (product_id, quantity_change, unit, total_price, movement_type, user_id)
+                        VALUES (?, ?, ?, ?, ?, ?)""",
+                     (product_id, quantity, unit, total_price, 'update', user_id))
+
+            conn.commit()
+            bump_generation()
+            return True, "Stok başarıyla güncellendi"
+        except sqlite3.IntegrityError:
+            return False, "Ürün veya kullanıcı bulunamadı"
+        except Exception as e:
+            return False, f"Beklenmeyen bir hata oluştu: {str(e)}"
+
+# Hareket tarihleri UTC, 'YYYY-AA-GG SS:DD:ss' metni olarak saklanır; rapor
+# aralıkları, sayfalama, günlük toplamlar ve dönem kapanışları bu biçime dayanır
+MOVEMENT_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def _normalize_movement_date(value):
+    """Hareket tarihini saklama biçimine çevirir; verilmezse None (şimdiki an).
+
+    ``datetime`` nesnesi ya da ISO 8601 metni (``T`` ayracı, saat dilimi ve
+    yalnızca tarih dahil) kabul edilir. Saat dilimi belirtilmemiş değerler
+    saklanan tarihler gibi UTC sayılır; geçersiz değerde ValueError verir.
     """
-    df = pd.read_sql_query(query, conn, params=[start_date, end_date])
-    conn.close()
-    return df
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).strip())
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime(MOVEMENT_DATE_FORMAT)
+
+def add_inventory_movements_bulk(rows, user_id):
+    """Birden çok stok hareketini tek bir işlemde kaydeder.
+
+    ``rows`` her biri ``product_id``, ``quantity``, ``unit``, ``total_price`` ve
+    isteğe bağlı ``movement_date`` anahtarlarını içeren sözlüklerdir. Her satır
+    için ``(başarılı, mesaj)`` çifti döner; geçersiz satırlar atlanır, geçerli
+    satırlar birlikte kaydedilir.
+    """
+    rows = list(rows)
+    results = [None] * len(rows)
+    # Doğrulanmış satırlar: (ürün, miktar, birim, toplam fiyat, hareket tarihi)
+    parsed = {}
+    valid = []
+    for idx, row in enumerate(rows):
+        product_id = row.get('product_id')
+        unit = row.get('unit')
+        try:
+            quantity = float(row.get('quantity'))
+            total_price = float(row.get('total_price'))
+        except (TypeError, ValueError):
+            quantity = total_price = None
+        if (not product_id or not unit or quantity is None or not math.isfinite(quantity)
+                or not math.isfinite(total_price) or total_price < 0):
+            results[idx] = (False, "Lütfen tüm alanları doğru şekilde doldurun")
+            continue
+        try:
+            movement_date = _normalize_movement_date(row.get('movement_date'))
+        except (TypeError, ValueError):
+            results[idx] = (False, f"Geçersiz hareket tarihi: {row.get('movement_date')}")
+            continue
+        parsed[idx] = (product_id, quantity, unit, total_price, movement_date)
+        valid.append(idx)
+
+    if not valid:
+        return results
+
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+
+            # Ürünlerin varlığını tek sorguda kontrol et
+            product_ids = sorted({parsed[idx][0] for idx in valid})
+            placeholders = ', '.join('?' * len(product_ids))
+            c.execute(f"SELECT id FROM products WHERE id IN ({placeholders})", product_ids)
+            known_products = {r[0] for r in c.fetchall()}
+
+            movements = []
+            deltas = {}
+            for idx in valid:
+                product_id, quantity, unit, total_price, movement_date = parsed[idx]
+                if product_id not in known_products:
+                    results[idx] = (False, "Ürün veya kullanıcı bulunamadı")
+                    continue
+                movements.append((product_id, quantity, unit, total_price,
+                                  'update', movement_date, user_id))
+                total_quantity, total_value, _ = deltas.get(product_id, (0, 0, None))
+                deltas[product_id] = (total_quantity + quantity, total_value + total_price, unit)
+                results[idx] = (True, "Stok başarıyla güncellendi")
+
+            if not movements:
+                conn.rollback()
+                return results
+
+            # Stok bakiyelerini ürün başına tek satırla güncelle
+            c.executemany(INVENTORY_UPSERT,
+                          [(pid, q, u, p, user_id) for pid, (q, p, u) in deltas.items()])
+
+            # Hareket kayıtları
+            c.executemany("""INSERT INTO inventory_movements
+                             (product_id, quantity_change, unit, total_price, movement_type, movement_date, user_id)
+                             VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)""",
+                          movements)
+
+            conn.commit()
+            bump_generation()
+        except Exception as e:
+            conn.rollback()
+            message = f"Beklenmeyen bir hata oluştu: {str(e)}"
+            results = [(False, message) if r is None or r[0] else r for r in results]
+        return results
+
+@cached_report('inventory')
+def get_inventory_report(start_date, end_date):
+    with get_db() as conn:
+        query = """
+        SELECT 
+            p.name as product_name,
+            i.unit,
+            i.total_price,
+            i.quantity as current_quantity,
+            SUM(im.quantity_change) as total_movement,
+            COUNT(im.id) as movement_count,
+            i.total_price as total_value
+        FROM products p
+        LEFT JOIN inventory i ON p.id = i.product_id
+        LEFT JOIN inventory_movements im ON p.id = im.product_id
+        AND im.movement_date BETWEEN ? AND ?
+        GROUP BY p.id
+        ORDER BY p.name
+        """
+        df = _read_frame(query, conn, params=[start_date, end_date])
+        return df
 
 def get_inventory():
-    conn = get_db()
-    df = pd.read_sql_query("""
-        SELECT p.name as product_name, i.* 
-        FROM inventory i 
-        JOIN products p ON i.product_id = p.id
-    """, conn)
-    conn.close()
-    return df
+    with get_db() as conn:
+        df = _read_frame("""
+            SELECT p.name as product_name, i.* 
+            FROM inventory i 
+            JOIN products p ON i.product_id = p.id
+        """, conn)
+        return df
 
 def get_latest_inventory_movements(limit=5):
-    conn = get_db()
+    with get_db() as conn:
+        query = """
+        SELECT 
+            p.name as product_name,
+            cat.name as product_category,
+            im.id as movement_id,
+            im.quantity_change as quantity,
+            im.unit,
+            im.total_price,
+            im.movement_date,
+            datetime(im.movement_date, 'localtime') as local_date
+        FROM inventory_movements im
+        JOIN products p ON im.product_id = p.id
+        JOIN categories cat ON cat.id = p.category_id
+        ORDER BY im.movement_date DESC
+        LIMIT ?
+        """
+        try:
+            df = _read_frame(query, conn, params=[limit])
+            return df.to_dict('records') if not df.empty else None
+        except Exception as e:
+            print(f"Hata: {str(e)}")
+            return None
+
+def get_movements_page(start, end, after_cursor=None, page_size=20):
+    """Tarih aralığındaki hareketleri yeniden eskiye sayfa sayfa döndürür.
+
+    ``start`` ve ``end`` yerel saattir ('%Y-%m-%d %H:%M:%S'). Sayfalama
+    ``(movement_date, id)`` imleciyle yapılır; böylece her sayfa geçmişin
+    büyüklüğünden bağımsız olarak indeks üzerinden okunur. ``(kayıtlar,
+    sonraki_imleç)`` döner; son sayfada imleç ``None`` olur.
+    """
     query = """
-    SELECT 
+    SELECT
         p.name as product_name,
-        p.category as product_category,
+        cat.name as product_category,
         im.id as movement_id,
         im.quantity_change as quantity,
         im.unit,
@@ -270,125 +1072,385 @@ def get_latest_inventory_movements(limit=5):
         datetime(im.movement_date, 'localtime') as local_date
     FROM inventory_movements im
     JOIN products p ON im.product_id = p.id
-    ORDER BY im.movement_date DESC
+    JOIN categories cat ON cat.id = p.category_id
+    WHERE im.movement_date >= datetime(?, 'utc')
+    AND {upper_bound}
+    ORDER BY im.movement_date DESC, im.id DESC
     LIMIT ?
     """
-    try:
-        df = pd.read_sql_query(query, conn, params=[limit])
-        return df.to_dict('records') if not df.empty else None
-    except Exception as e:
-        print(f"Hata: {str(e)}")
-        return None
-    finally:
-        conn.close()
+    params = [start]
+    if after_cursor is None:
+        upper_bound = "im.movement_date <= datetime(?, 'utc')"
+        params.append(end)
+    else:
+        # İmleç her zaman bitiş tarihinden önce olduğundan üst sınır imleçtir;
+        # böylece indeks taraması doğrudan imleçten başlar
+        upper_bound = "im.movement_date <= ? AND (im.movement_date, im.id) < (?, ?)"
+        params.extend([after_cursor[0], after_cursor[0], after_cursor[1]])
+    params.append(page_size + 1)
+
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute(query.format(upper_bound=upper_bound), params)
+        records = [dict(row) for row in c.fetchall()]
+
+    next_cursor = None
+    if len(records) > page_size:
+        records = records[:page_size]
+        last = records[-1]
+        next_cursor = (last['movement_date'], last['movement_id'])
+    return records, next_cursor
 
 def delete_inventory_movement(movement_id):
     if not movement_id:
         return False, "Geçersiz hareket ID'si"
 
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        # Önce hareketin detaylarını al
-        c.execute("""
-            SELECT product_id, quantity_change, total_price, unit
-            FROM inventory_movements
-            WHERE id = ?
-        """, (movement_id,))
-        movement = c.fetchone()
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            # Önce hareketin detaylarını al
+            c.execute("""
+                SELECT product_id, quantity_change, total_price, unit
+                FROM inventory_movements
+                WHERE id = ?
+            """, (movement_id,))
+            movement = c.fetchone()
 
-        if not movement:
-            return False, "Hareket bulunamadı"
+            if not movement:
+                return False, "Hareket bulunamadı"
 
-        product_id, quantity, total_price, unit = movement
+            product_id, quantity, total_price, unit = movement
 
-        # Stok miktarını güncelle
-        c.execute("""
-            UPDATE inventory 
-            SET quantity = quantity - ?,
-                total_price = total_price - ?
-            WHERE product_id = ? AND unit = ?
-        """, (quantity, total_price, product_id, unit))
-
-        # Hareketi sil
-        c.execute("DELETE FROM inventory_movements WHERE id = ?", (movement_id,))
-
-        conn.commit()
-        return True, "Stok hareketi başarıyla silindi"
-    except Exception as e:
-        return False, f"Stok hareketi silinirken hata oluştu: {str(e)}"
-    finally:
-        conn.close()
+            # Stok miktarını güncelle
+            c.execute("""
+                UPDATE inventory 
+                SET quantity = quantity - ?,
+                    total_price = total_price - ?
+                WHERE product_id = ? AND unit = ?
+            """, (quantity, total_price, product_id, unit))
+
+            # Hareketi sil
+            c.execute("DELETE FROM inventory_movements WHERE id = ?", (movement_id,))
+
+            conn.commit()
+            bump_generation()
+            return True, "Stok hareketi başarıyla silindi"
+        except Exception as e:
+            return False, f"Stok hareketi silinirken hata oluştu: {str(e)}"
 
 def delete_product(product_id):
     if not product_id:
         return False, "Geçersiz ürün ID'si"
 
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        # İlk olarak bu ürünün stok hareketleri var mı kontrol et
-        c.execute("SELECT COUNT(*) FROM inventory_movements WHERE product_id = ?", (product_id,))
-        movement_count = c.fetchone()[0]
-
-        # Varsa önce stok hareketlerini temizleyelim
-        if movement_count > 0:
-            # Stok hareketlerinin silinmesi gerektiğini bildiren mesaj yerine,
-            # tüm stok hareketlerini silelim
-            c.execute("DELETE FROM inventory_movements WHERE product_id = ?", (product_id,))
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            # İlk olarak bu ürünün stok hareketleri var mı kontrol et
+            c.execute("SELECT COUNT(*) FROM inventory_movements WHERE product_id = ?", (product_id,))
+            movement_count = c.fetchone()[0]
+
+            # Varsa önce stok hareketlerini temizleyelim
+            if movement_count > 0:
+                # Stok hareketlerinin silinmesi gerektiğini bildiren mesaj yerine,
+                # tüm stok hareketlerini silelim
+                c.execute("DELETE FROM inventory_movements WHERE product_id = ?", (product_id,))
             
-            # Inventory tablosundan da ilgili ürün kayıtlarını temizleyelim
-            c.execute("DELETE FROM inventory WHERE product_id = ?", (product_id,))
+                # Inventory tablosundan da ilgili ürün kayıtlarını temizleyelim
+                c.execute("DELETE FROM inventory WHERE product_id = ?", (product_id,))
             
-            # Ürüne ait tüm stok hareketleri temizlendi, şimdi ürünü silebiliriz
+                # Ürüne ait tüm stok hareketleri temizlendi, şimdi ürünü silebiliriz
             
-        # Ürünü sil
-        c.execute("DELETE FROM products WHERE id = ?", (product_id,))
-        if c.rowcount == 0:
-            return False, "Ürün bulunamadı"
-
-        conn.commit()
-        return True, "Ürün başarıyla silindi"
-    except Exception as e:
-        return False, f"Ürün silinirken hata oluştu: {str(e)}"
-    finally:
-        conn.close()
+            # Ürünü sil
+            c.execute("DELETE FROM products WHERE id = ?", (product_id,))
+            if c.rowcount == 0:
+                return False, "Ürün bulunamadı"
+
+            conn.commit()
+            bump_generation()
+            invalidate_table('products')
+            return True, "Ürün başarıyla silindi"
+        except Exception as e:
+            return False, f"Ürün silinirken hata oluştu: {str(e)}"
+
+def delete_products(product_ids):
+    """Seçilen ürünleri stok hareketleri ve bakiyeleriyle birlikte tek işlemde siler."""
+    product_ids = [int(product_id) for product_id in product_ids if product_id]
+    if not product_ids:
+        return False, "Silinecek ürün seçilmedi"
+
+    params = [(product_id,) for product_id in product_ids]
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            c.executemany("DELETE FROM inventory_movements WHERE product_id = ?", params)
+            c.executemany("DELETE FROM inventory WHERE product_id = ?", params)
+            c.executemany("DELETE FROM products WHERE id = ?", params)
+            deleted = c.rowcount
+            if deleted == 0:
+                conn.rollback()
+                return False, "Ürün bulunamadı"
+
+            conn.commit()
+            bump_generation()
+            invalidate_table('products')
+            return True, f"{deleted} ürün silindi"
+        except Exception as e:
+            return False, f"Ürünler silinirken hata oluştu: {str(e)}"
+
+# Bir dönem kapanışından (``boundary``, dahil) verilen UTC anına (hariç) kadarki
+# bakiye kaynakları: kapanış bakiyesi, kapanıştan sonraki ilk gece yarısına ve
+# son güne düşen hareketler ham tablodan, aradaki tam günler günlük toplamlardan
+STOCK_BALANCE_SOURCES = """
+    SELECT product_id, unit, quantity, value
+    FROM stock_snapshots WHERE period = ?
+    UNION ALL
+    SELECT product_id, unit, quantity_change, total_price
+    FROM inventory_movements
+    WHERE movement_date >= ? AND movement_date < ? AND movement_date < ?
+    UNION ALL
+    SELECT product_id, unit, qty, value
+    FROM movement_daily_rollup WHERE day >= ? AND day < ?
+    UNION ALL
+    SELECT product_id, unit, quantity_change, total_price
+    FROM inventory_movements WHERE movement_date >= ? AND movement_date < ?
+"""
+
+def _stock_balance_params(period, boundary, until):
+    """``STOCK_BALANCE_SOURCES`` parametreleri. ``boundary`` önceki kapanışın
+    sınırı (yoksa boş metin), ``until`` UTC 'YYYY-AA-GG SS:DD:ss' metnidir."""
+    if boundary[10:] in ('', ' 00:00:00'):
+        head_end = boundary[:10]
+    else:
+        head_end = (datetime.fromisoformat(boundary[:10]) + timedelta(days=1)).date().isoformat()
+    last_day = until[:10]
+    return [period, boundary, head_end, until, head_end, last_day, max(head_end, last_day), until]
+
+def _to_utc(c, local_time):
+    """Yerel saatteki 'YYYY-AA-GG SS:DD:ss' metnini hareket tarihleriyle
+    karşılaştırılabilir UTC metnine çevirir (hareket sayfasındaki gibi SQLite ile)."""
+    c.execute("SELECT datetime(?, 'utc')", (local_time,))
+    return c.fetchone()[0]
+
+def close_period(year, month, user_id):
+    """Ayı kapatır ve ay sonundaki stok bakiyelerini kaydeder.
+
+    Ay sınırı sunucunun yerel saatine göre ayın son gününün bitişidir; UTC
+    karşılığı ``stock_periods.boundary`` olarak saklanır. Bakiye, bir önceki
+    kapanıştan başlayıp aradaki günlük toplamlar eklenerek hesaplanır; böylece
+    kapanış maliyeti tüm geçmişe bağlı değildir.
+    """
+    try:
+        period_start = datetime(int(year), int(month), 1).date()
+    except (TypeError, ValueError):
+        return False, "Geçersiz dönem"
+    period = period_start.strftime('%Y-%m')
+    next_start = (period_start + timedelta(days=32)).replace(day=1)
+
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute("SELECT 1 FROM stock_periods WHERE period = ?", (period,))
+            if c.fetchone():
+                conn.rollback()
+                return False, f"{period} dönemi zaten kapatılmış"
+            boundary = _to_utc(c, f"{next_start.isoformat()} 00:00:00")
+
+            # En yakın önceki kapanış
+            c.execute("""SELECT period, boundary FROM stock_periods
+                         WHERE boundary < ? ORDER BY boundary DESC LIMIT 1""", (boundary,))
+            previous = c.fetchone()
+            prev_period, prev_boundary = previous if previous else (None, '')
+
+            c.execute(f"""
+                INSERT INTO stock_snapshots (period, product_id, unit, quantity, value)
+                SELECT ?, product_id, unit, SUM(quantity), SUM(value)
+                FROM ({STOCK_BALANCE_SOURCES})
+                GROUP BY product_id, unit
+            """, [period] + _stock_balance_params(prev_period, prev_boundary, boundary))
+            c.execute("INSERT INTO stock_periods (period, boundary, closed_by) VALUES (?, ?, ?)",
+                      (period, boundary, user_id))
+            conn.commit()
+            bump_generation()
+            return True, f"{period} dönemi kapatıldı"
+        except Exception as e:
+            conn.rollback()
+            return False, f"Dönem kapatılırken hata oluştu: {str(e)}"
+
+def get_closed_periods():
+    with get_db() as conn:
+        df = _read_frame("""
+            SELECT sp.period, sp.closed_at, u.username as closed_by
+            FROM stock_periods sp
+            LEFT JOIN users u ON sp.closed_by = u.id
+            ORDER BY sp.period DESC
+        """, conn)
+        return df
+
+@cached_report('stock_as_of')
+def get_stock_as_of(timestamp):
+    """Verilen andaki (dahil) stok miktarı ve değerini ürün/birim bazında döndürür.
+
+    ``timestamp`` sunucunun yerel saatidir ve hareket tarihleri gibi UTC'ye
+    çevrilerek karşılaştırılır. En yakın önceki dönem kapanışından başlar;
+    sonrasındaki tam günler günlük toplamlardan, kenar günler ham hareketlerden
+    eklenir.
+    """
+    as_of = _parse_report_time(timestamp)
+    if as_of is None:
+        raise ValueError(f"Geçersiz tarih: {timestamp}")
+
+    query = f"""
+    SELECT
+        cat.name as category,
+        p.name as product_name,
+        m.unit,
+        SUM(m.quantity) as quantity,
+        SUM(m.value) as total_value
+    FROM ({STOCK_BALANCE_SOURCES}) m
+    JOIN products p ON p.id = m.product_id
+    JOIN categories cat ON cat.id = p.category_id
+    GROUP BY p.id, m.unit
+    ORDER BY cat.name, p.name
+    """
+    with get_db() as conn:
+        c = conn.cursor()
+        # Hareket tarihleri saniye hassasiyetinde; verilen saniye dahil edilir
+        until = _to_utc(c, (as_of + timedelta(seconds=1)).strftime('%Y-%m-%d %H:%M:%S'))
+        c.execute("""SELECT period, boundary FROM stock_periods
+                     WHERE boundary <= ? ORDER BY boundary DESC LIMIT 1""", (until,))
+        snapshot = c.fetchone()
+        period, boundary = snapshot if snapshot else (None, '')
+        df = _read_frame(query, conn, params=_stock_balance_params(period, boundary, until))
+        return df
+
+DETAILED_MOVEMENTS_QUERY = """
+SELECT 
+    datetime(im.movement_date, 'localtime') as "TARİH",
+    cat.name as "BÖLÜM",
+    p.name as "ÜRÜN ADI",
+    im.quantity_change as "MİKTAR",
+    im.unit as "BİRİM",
+    ROUND(CAST(im.total_price as FLOAT) / CAST(im.quantity_change as FLOAT), 2) as "BİRİM FİYAT",
+    im.total_price as "TOPLAM FİYAT"
+FROM inventory_movements im
+JOIN products p ON im.product_id = p.id
+JOIN categories cat ON cat.id = p.category_id
+WHERE im.movement_date BETWEEN ? AND ?
+ORDER BY cat.name, p.name, im.movement_date DESC
+"""
+
+# Akışlı dışa aktarımda imleçten bir seferde okunan satır sayısı
+STREAM_BATCH_SIZE = 5000
+# Rapor sayfasında önizlenen en fazla satır; tamamı yalnızca dosyaya akıtılır
+REPORT_PREVIEW_ROWS = 500
 
 def get_detailed_movements_report(start_date, end_date):
-    conn = get_db()
-    query = """
-    SELECT 
-        datetime(im.movement_date, 'localtime') as "TARİH",
-        p.category as "BÖLÜM",
-        p.name as "ÜRÜN ADI",
-        im.quantity_change as "MİKTAR",
-        im.unit as "BİRİM",
-        ROUND(CAST(im.total_price as FLOAT) / CAST(im.quantity_change as FLOAT), 2) as "BİRİM FİYAT",
-        im.total_price as "TOPLAM FİYAT"
-    FROM inventory_movements im
-    JOIN products p ON im.product_id = p.id
-    WHERE im.movement_date BETWEEN ? AND ?
-    ORDER BY p.category, p.name, im.movement_date DESC
+    """Detaylı hareket raporunun tamamı. Boyutu aralıkla büyüdüğünden rapor
+    önbelleğine alınmaz; sayfa önizleme ve sayıyı kullanır."""
+    with get_db() as conn:
+        df = _read_frame(DETAILED_MOVEMENTS_QUERY, conn, params=[start_date, end_date])
+        return df
+
+@cached_report('detailed_movements_preview')
+def get_detailed_movements_preview(start_date, end_date, limit=REPORT_PREVIEW_ROWS):
+    """Detaylı raporun ilk ``limit`` satırı; büyük aralıklarda da bellekte
+    yalnızca bu kadar satır tutulur."""
+    with get_db() as conn:
+        return _read_frame(DETAILED_MOVEMENTS_QUERY + "LIMIT ?", conn,
+                           params=[start_date, end_date, limit])
+
+@cached_report('detailed_movements_count')
+def count_detailed_movements(start_date, end_date):
+    """Detaylı rapordaki satır sayısı (önizleme ve arka plan işlerinde ilerleme için)."""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*) FROM inventory_movements WHERE movement_date BETWEEN ? AND ?",
+                  (start_date, end_date))
+        return c.fetchone()[0]
+
+def iter_detailed_movements_report(start_date, end_date, batch_size=STREAM_BATCH_SIZE):
+    """Detaylı hareket raporunu DataFrame oluşturmadan parça parça okur.
+
+    İlk eleman sütun adlarının listesidir, ardından en fazla ``batch_size``
+    satırlık gruplar gelir. Bağlantı, üreteç tükenene ya da kapatılana kadar
+    havuzdan alınmış olarak kalır.
     """
-    df = pd.read_sql_query(query, conn, params=[start_date, end_date])
-    conn.close()
-    return df
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute(DETAILED_MOVEMENTS_QUERY, (start_date, end_date))
+        yield [column[0] for column in c.description]
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+        c.close()
 
+def _parse_report_time(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+def _full_day_span(start_date, end_date):
+    """Aralığın tamamen içerdiği ilk ve son günü döndürür (yoksa None)."""
+    start = _parse_report_time(start_date)
+    end = _parse_report_time(end_date)
+    if start is None or end is None:
+        return None
+    first_day = start.date() if start.time() == datetime.min.time() else start.date() + timedelta(days=1)
+    last_day = end.date() if end.time() >= DAY_END else end.date() - timedelta(days=1)
+    if first_day > last_day:
+        return None
+    return first_day, last_day
+
+@cached_report('summary')
 def get_summary_report(start_date, end_date):
-    conn = get_db()
-    query = """
+    # Tam günler günlük toplam tablosundan, kenardaki kısmi günler ham
+    # hareketlerden okunur
+    span = _full_day_span(start_date, end_date)
+    if span is None:
+        movements = """
+            SELECT product_id, unit, quantity_change as qty, total_price as value
+            FROM inventory_movements
+            WHERE movement_date BETWEEN ? AND ?
+        """
+        params = [start_date, end_date]
+    else:
+        first_day, last_day = span
+        movements = """
+            SELECT product_id, unit, quantity_change as qty, total_price as value
+            FROM inventory_movements
+            WHERE movement_date >= ? AND movement_date < ?
+            UNION ALL
+            SELECT product_id, unit, qty, value
+            FROM movement_daily_rollup
+            WHERE day BETWEEN ? AND ?
+            UNION ALL
+            SELECT product_id, unit, quantity_change as qty, total_price as value
+            FROM inventory_movements
+            WHERE movement_date >= ? AND movement_date <= ?
+        """
+        params = [start_date, first_day.isoformat(),
+                  first_day.isoformat(), last_day.isoformat(),
+                  (last_day + timedelta(days=1)).isoformat(), end_date]
+
+    query = f"""
     SELECT 
-        p.category as "BÖLÜM",
+        cat.name as "BÖLÜM",
         p.name as "ÜRÜN ADI",
-        SUM(im.quantity_change) as "TOPLAM MİKTAR",
-        im.unit as "BİRİM",
-        SUM(im.total_price) as "TOPLAM FİYAT"
-    FROM products p
-    LEFT JOIN inventory_movements im ON p.id = im.product_id
-    WHERE im.movement_date BETWEEN ? AND ?
-    GROUP BY p.id, im.unit
-    ORDER BY p.category, p.name
+        SUM(m.qty) as "TOPLAM MİKTAR",
+        m.unit as "BİRİM",
+        SUM(m.value) as "TOPLAM FİYAT"
+    FROM ({movements}) m
+    JOIN products p ON p.id = m.product_id
+    JOIN categories cat ON cat.id = p.category_id
+    GROUP BY p.id, m.unit
+    ORDER BY cat.name, p.name
     """
-    df = pd.read_sql_query(query, conn, params=[start_date, end_date])
-    conn.close()
-    return df
+    with get_db() as conn:
+        df = _read_frame(query, conn, params=params)
+        return df
@@ -0,0 +1,159 @@
+"""Komut satırından toplu rapor üretimi. Streamlit'e ihtiyaç duymaz; cron ile
+çalıştırılabilir.
+
+Örnek kullanım:
+
+    python generate_reports.py --year 2024 --output raporlar/
+    python generate_reports.py --start 2024-01-01 --end 2024-06-30 --period week \\
+        --reports summary --category BAR --category MUTFAK --jobs 4
+
+Her (rapor, tarih aralığı) çifti bir işçi süreçte tek sorguyla okunur; bölüm
+(kategori) dosyaları aynı sonuçtan süzülerek yazılır.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import database
+from database import get_detailed_movements_report, get_summary_report
+from utils import export_to_excel
+
+# Rapor adı: (rapor fonksiyonu, dosya adı öneki); önekler arayüzdeki indirmelerle aynı
+REPORTS = {
+    'detailed': (get_detailed_movements_report, 'detayli_stok_raporu'),
+    'summary': (get_summary_report, 'ozet_stok_raporu'),
+}
+PERIODS = ('month', 'week', 'day', 'all')
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def split_ranges(start, end, period):
+    """[start, end] gün aralığını döneme göre böler; (etiket, ilk gün, son gün) döndürür."""
+    ranges = []
+    current = start
+    while current <= end:
+        if period == 'month':
+            next_start = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+            label = current.strftime('%Y-%m')
+        elif period == 'week':
+            next_start = current + timedelta(days=7 - current.weekday())
+            label = f"{current.isocalendar()[0]}-H{current.isocalendar()[1]:02d}"
+        elif period == 'day':
+            next_start = current + timedelta(days=1)
+            label = current.isoformat()
+        else:
+            next_start = end + timedelta(days=1)
+            label = f"{start.isoformat()}_{end.isoformat()}"
+        last = min(next_start - timedelta(days=1), end)
+        ranges.append((label, current, last))
+        current = next_start
+    return ranges
+
+
+def generate(db_path, output_dir, report, label, first_day, last_day, categories=(), skip_empty=True):
+    """Bir rapor ve tarih aralığı için dosyaları yazar (işçi süreçte çalışır).
+
+    Returns:
+        [(dosya yolu, satır sayısı)] — boş olduğu için atlanan dosyalarda yol None
+    """
+    database.DB_PATH = db_path
+    report_func, prefix = REPORTS[report]
+    start_date = f"{first_day.isoformat()} 00:00:00"
+    end_date = f"{last_day.isoformat()} 23:59:59"
+    title_start = first_day.strftime('%d.%m.%Y 00:00')
+    title_end = last_day.strftime('%d.%m.%Y 23:59')
+    df = report_func(start_date, end_date)
+
+    parts = [(None, df)] if not categories else [
+        (category, df[df['BÖLÜM'] == category]) for category in categories
+    ]
+    results = []
+    for category, part in parts:
+        if part.empty and skip_empty:
+            results.append((None, 0))
+            continue
+        suffix = f"_{category}" if category else ''
+        path = os.path.join(output_dir, f"{prefix}_{label}{suffix}.xlsx")
+        with open(path, 'wb') as f:
+            f.write(export_to_excel(part, start_date=title_start, end_date=title_end))
+        results.append((path, len(part)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Birden çok tarih aralığı için Excel raporları üretir")
+    parser.add_argument("--db", help="Veritabanı dosyası (varsayılan: restaurant.db)")
+    parser.add_argument("--output", default="raporlar", help="Dosyaların yazılacağı dizin")
+    parser.add_argument("--year", type=int, help="Yıl (--start/--end yerine)")
+    parser.add_argument("--start", type=_parse_date, help="İlk gün (YYYY-AA-GG)")
+    parser.add_argument("--end", type=_parse_date, help="Son gün (YYYY-AA-GG)")
+    parser.add_argument("--period", choices=PERIODS, default="month",
+                        help="Aralığın bölüneceği dönem (varsayılan: month)")
+    parser.add_argument("--reports", default="detailed,summary",
+                        help="Virgülle ayrılmış rapor türleri: " + ", ".join(REPORTS))
+    parser.add_argument("--category", action="append", default=[],
+                        help="Yalnızca bu bölüm için dosya üret (birden çok kez verilebilir)")
+    parser.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Paralel işçi süreç sayısı")
+    parser.add_argument("--include-empty", action="store_true", help="Boş raporları da yaz")
+    args = parser.parse_args(argv)
+
+    if args.year:
+        start, end = date(args.year, 1, 1), date(args.year, 12, 31)
+    elif args.start and args.end:
+        start, end = args.start, args.end
+    else:
+        parser.error("--year ya da --start ve --end verilmelidir")
+    if start > end:
+        parser.error("Başlangıç tarihi bitiş tarihinden sonra olamaz")
+    reports = [name.strip() for name in args.reports.split(',') if name.strip()]
+    unknown = [name for name in reports if name not in REPORTS]
+    if unknown:
+        parser.error(f"Bilinmeyen rapor türü: {', '.join(unknown)}")
+
+    if args.db:
+        database.DB_PATH = args.db
+    db_path = os.path.abspath(database.DB_PATH)
+    if not os.path.exists(db_path):
+        parser.error(f"Veritabanı bulunamadı: {db_path}")
+    # Şema güncellemesi işçiler başlamadan bir kez yapılır
+    database.init_db()
+    database.close_pool()
+    os.makedirs(args.output, exist_ok=True)
+
+    tasks = [(report, label, first_day, last_day)
+             for label, first_day, last_day in split_ranges(start, end, args.period)
+             for report in reports]
+    written = skipped = failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {
+            executor.submit(generate, db_path, args.output, report, label, first_day, last_day,
+                            tuple(args.category), not args.include_empty): (report, label)
+            for report, label, first_day, last_day in tasks
+        }
+        for future in as_completed(futures):
+            report, label = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"HATA {report} {label}: {e}", file=sys.stderr)
+                continue
+            for path, rows in results:
+                if path is None:
+                    skipped += 1
+                else:
+                    written += 1
+                    print(f"{path} ({rows} satır)")
+
+    print(f"{written} dosya yazıldı, {skipped} boş rapor atlandı, {failed} hata")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,4 @@
-from database import add_user, init_db
-from auth import hash_password
+from database import add_user, hash_password, init_db
 
 def create_admin():
     init_db()  # Veritabanını başlat
@@ -0,0 +1,265 @@
+"""Büyük raporlar için arka plan iş kuyruğu.
+
+Raporlar Streamlit betiğinin iş parçacığında değil, sınırlı sayıda işçi
+süreçte üretilir; böylece uzun süren bir Excel dosyası ne raporu isteyen
+oturumu dondurur ne de aynı sunucudaki diğer oturumları yavaşlatır.
+Hazırlanan dosyalar ``REPORT_JOB_DIR`` altında saklanır ve
+``REPORT_JOB_TTL`` süresi dolunca silinir.
+
+İş kayıtları sunucu sürecinin belleğinde tutulur; işçi süreçler ilerlemeyi
+iş dizinindeki küçük bir ``.progress`` dosyasına yazar.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Aynı anda çalışan rapor işi sayısı (işçi süreç sayısı)
+REPORT_JOB_WORKERS = int(os.environ.get('RESTAURANT_REPORT_WORKERS', '2'))
+# Çalışan ve bekleyen işlerin toplam üst sınırı; dolduğunda yeni iş reddedilir
+REPORT_JOB_LIMIT = int(os.environ.get('RESTAURANT_REPORT_QUEUE', '6'))
+REPORT_JOB_DIR = os.environ.get('RESTAURANT_REPORT_DIR', 'report_jobs')
+# Hazır dosyaların saklanma süresi (saniye)
+REPORT_JOB_TTL = int(os.environ.get('RESTAURANT_REPORT_TTL_HOURS', '24')) * 3600
+
+# Rapor türü: (görünen ad, dosya uzantısı)
+REPORT_KINDS = {
+    'detailed_xlsx': ("Detaylı Hareket Raporu (Excel)", '.xlsx'),
+    'detailed_csv': ("Detaylı Hareket Raporu (CSV)", '.csv'),
+    'summary_xlsx': ("Özet Rapor (Excel)", '.xlsx'),
+}
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+_lock = threading.Lock()
+_jobs = {}
+_executor = None
+
+
+def _progress_path(job_dir, job_id):
+    return os.path.join(job_dir, job_id + '.progress')
+
+
+def _write_progress(path, done, total):
+    # Okuyucu yarım yazılmış dosya görmesin diye değiştir-taşı ile yazılır
+    partial = path + '.tmp'
+    with open(partial, 'w') as f:
+        f.write(f"{done} {total}")
+    os.replace(partial, path)
+
+
+def _run_job(job_id, kind, start_date, end_date, title_range, db_path, job_dir):
+    """İşçi süreçte çalışır: raporu üretip dosya yolunu döndürür."""
+    import cache
+    import database
+    import utils
+
+    database.DB_PATH = db_path
+    # Veri sürümü süreç içinde tutulur; sunucu sürecindeki yazmalar işçinin
+    # sürümünü artırmadığından önceki işlerden kalan sonuçlar kullanılmaz
+    cache.clear_caches()
+    path = os.path.join(job_dir, job_id + REPORT_KINDS[kind][1])
+    partial = path + '.part'
+    progress_path = _progress_path(job_dir, job_id)
+    _write_progress(progress_path, 0, 0)
+    try:
+        if kind == 'summary_xlsx':
+            with open(partial, 'wb') as f:
+                utils.export_summary_report(f, start_date, end_date, title_range)
+            _write_progress(progress_path, 1, 1)
+        else:
+            total = database.count_detailed_movements(start_date, end_date)
+            batches = database.iter_detailed_movements_report(start_date, end_date)
+            progress = lambda done: _write_progress(progress_path, done, total)
+            with open(partial, 'wb') as f:
+                if kind == 'detailed_csv':
+                    utils.stream_to_csv(batches, f, progress=progress)
+                else:
+                    utils.stream_to_excel(batches, f, title_range[0], title_range[1],
+                                          progress=progress)
+        os.replace(partial, path)
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return path
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # Streamlit sunucusu çok iş parçacıklı olduğundan fork yerine spawn kullanılır
+        _executor = ProcessPoolExecutor(max_workers=REPORT_JOB_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _reset_executor():
+    """Havuzu kapatır; bir sonraki iş yeni bir havuz açar (kilit
+    altında çağrılır)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _refresh(job):
+    """İşin durumunu ve ilerlemesini günceller (kilit altında çağrılır)."""
+    if job['status'] in (DONE, FAILED):
+        return
+    future = job['future']
+    if future.done():
+        job['finished_at'] = time.time()
+        error = future.exception()
+        if error is None:
+            job['status'] = DONE
+            job['progress'] = 1.0
+        else:
+            job['status'] = FAILED
+            job['error'] = str(error)
+            # Bir işçi süreç öldürüldüyse (ör. bellek yetmedi) havuz bir daha iş kabul etmez
+            if isinstance(error, BrokenProcessPool) and job['executor'] is _executor:
+                _reset_executor()
+        progress_path = _progress_path(job['dir'], job['id'])
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        return
+    try:
+        with open(_progress_path(job['dir'], job['id'])) as f:
+            done, total = map(int, f.read().split())
+    except (OSError, ValueError):
+        return
+    job['status'] = RUNNING
+    job['progress'] = min(done / total, 1.0) if total else 0.0
+
+
+def _public(job):
+    return {key: value for key, value in job.items() if key not in ('future', 'executor', 'dir')}
+
+
+def cleanup_expired(now=None):
+    """Süresi dolmuş işleri ve dosyalarını (önceki çalıştırmalardan kalanlar
+    dahil) siler."""
+    now = time.time() if now is None else now
+    with _lock:
+        for job_id, job in list(_jobs.items()):
+            _refresh(job)
+            if job['status'] in (DONE, FAILED) and now - job['finished_at'] > REPORT_JOB_TTL:
+                del _jobs[job_id]
+        active = {job['id'] for job in _jobs.values()}
+    if not os.path.isdir(REPORT_JOB_DIR):
+        return
+    for name in os.listdir(REPORT_JOB_DIR):
+        path = os.path.join(REPORT_JOB_DIR, name)
+        if name.split('.', 1)[0] in active:
+            continue
+        try:
+            if now - os.path.getmtime(path) > REPORT_JOB_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def submit_report_job(kind, start_date, end_date, user_id, title_range=(None, None)):
+    """Rapor işini kuyruğa ekler. Kuyruk doluysa iş reddedilir.
+
+    Returns:
+        (başarılı mı, iş kimliği veya hata mesajı)
+    """
+    if kind not in REPORT_KINDS:
+        return False, "Geçersiz rapor türü"
+    import database
+
+    cleanup_expired()
+    os.makedirs(REPORT_JOB_DIR, exist_ok=True)
+    with _lock:
+        active = 0
+        for job in _jobs.values():
+            _refresh(job)
+            if job['status'] in (QUEUED, RUNNING):
+                active += 1
+                # Aynı kullanıcının aynı raporu zaten hazırlanıyorsa yenisi açılmaz
+                if (job['user_id'] == user_id and job['kind'] == kind
+                        and job['range'] == (start_date, end_date)):
+                    return True, job['id']
+        if active >= REPORT_JOB_LIMIT:
+            return False, "Rapor kuyruğu dolu, lütfen mevcut raporlar bitince tekrar deneyin"
+
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.abspath(REPORT_JOB_DIR)
+        job_args = (_run_job, job_id, kind, start_date, end_date, tuple(title_range),
+                    os.path.abspath(database.DB_PATH), job_dir)
+        try:
+            future = _get_executor().submit(*job_args)
+        except BrokenProcessPool:
+            # Havuz bozulduğu fark edilmeden önce gelen ilk istek yeni havuzla denenir
+            _reset_executor()
+            try:
+                future = _get_executor().submit(*job_args)
+            except BrokenProcessPool:
+                _reset_executor()
+                return False, "Rapor işçileri başlatılamadı, lütfen tekrar deneyin"
+        _jobs[job_id] = {
+            'id': job_id,
+            'kind': kind,
+            'label': REPORT_KINDS[kind][0],
+            'range': (start_date, end_date),
+            'user_id': user_id,
+            'status': QUEUED,
+            'progress': 0.0,
+            'error': None,
+            'path': os.path.join(job_dir, job_id + REPORT_KINDS[kind][1]),
+            'created_at': time.time(),
+            'finished_at': None,
+            'future': future,
+            'executor': _executor,
+            'dir': job_dir,
+        }
+    return True, job_id
+
+
+def get_job(job_id):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        _refresh(job)
+        return _public(job)
+
+
+def list_jobs(user_id=None):
+    """İşleri en yeniden eskiye döndürür; ``user_id`` verilirse yalnızca o
+    kullanıcınınkiler."""
+    with _lock:
+        jobs = []
+        for job in _jobs.values():
+            if user_id is not None and job['user_id'] != user_id:
+                continue
+            _refresh(job)
+            jobs.append(_public(job))
+    jobs.sort(key=lambda job: job['created_at'], reverse=True)
+    return jobs
+
+
+def read_job_file(job_id):
+    """Tamamlanmış işin dosya içeriği; dosya yoksa None."""
+    job = get_job(job_id)
+    if job is None or job['status'] != DONE:
+        return None
+    try:
+        with open(job['path'], 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def shutdown():
+    with _lock:
+        _reset_executor()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,228 @@
+import logging
+import os
+import random
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+
+# Sorgu ölçümü ayarları. Kapalıyken havuz düz sqlite3.Connection kullanır,
+# yani ölçüm kodu hiç çalışmaz.
+ENABLED = os.environ.get('RESTAURANT_DB_PROFILE', '0') == '1'
+SAMPLE_RATE = float(os.environ.get('RESTAURANT_DB_PROFILE_SAMPLE', '1.0'))
+SLOW_QUERY_MS = float(os.environ.get('RESTAURANT_SLOW_QUERY_MS', '100'))
+SLOW_QUERY_LOG = os.environ.get('RESTAURANT_SLOW_QUERY_LOG')
+SLOW_QUERY_HISTORY = 100
+
+logger = logging.getLogger('restaurant.slow_query')
+if SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG, encoding='utf-8')
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+_function_stats = {}
+_statement_stats = {}
+_slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+
+
+def configure(enabled=None, sample_rate=None, slow_query_ms=None):
+    """Ölçüm ayarlarını değiştirir. Yeni ayar yeni açılan bağlantılarda geçerli
+    olur; havuzdaki bağlantıların yenilenmesi için database.set_profiling
+    kullanılmalıdır."""
+    global ENABLED, SAMPLE_RATE, SLOW_QUERY_MS
+    if enabled is not None:
+        ENABLED = enabled
+    if sample_rate is not None:
+        SAMPLE_RATE = sample_rate
+    if slow_query_ms is not None:
+        SLOW_QUERY_MS = slow_query_ms
+
+
+def connection_factory():
+    return ProfilingConnection if ENABLED else sqlite3.Connection
+
+
+def _normalize(sql):
+    return ' '.join(sql.split())
+
+
+def _record_statement(conn, sql, params, elapsed, rows, many=False):
+    statement = _normalize(sql)
+    with _lock:
+        stats = _statement_stats.setdefault(statement, [0, 0.0, 0.0, 0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+        stats[3] += max(rows, 0)
+
+    if elapsed * 1000 < SLOW_QUERY_MS or statement.upper().startswith(('EXPLAIN', 'PRAGMA', 'BEGIN')):
+        return
+    plan = None
+    if not many:
+        try:
+            cur = sqlite3.Cursor(conn)
+            plan_rows = sqlite3.Cursor.execute(cur, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            plan = '\n'.join(row[3] for row in plan_rows)
+            cur.close()
+        except sqlite3.Error:
+            plan = None
+    entry = {
+        'function': conn._function,
+        'statement': statement,
+        'ms': round(elapsed * 1000, 2),
+        'rows': rows,
+        'plan': plan,
+    }
+    with _lock:
+        _slow_queries.append(entry)
+    logger.info("%s %.1f ms rows=%s\n%s\n%s", entry['function'], entry['ms'], rows, statement, plan or '')
+
+
+def _record_function(function, elapsed):
+    with _lock:
+        stats = _function_stats.setdefault(function, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Son çalıştırılan cümlenin süresini ve satır sayısını, sonuçlar okunana
+    kadar biriktirip kaydeder."""
+
+    _pending = None
+
+    def _flush(self):
+        if self._pending is not None:
+            sql, params, elapsed, rows, many = self._pending
+            self._pending = None
+            _record_statement(self.connection, sql, params, elapsed, rows, many)
+
+    def _sampled(self):
+        return self.connection._sampled
+
+    def execute(self, sql, parameters=()):
+        if not self._sampled():
+            return super().execute(sql, parameters)
+        self._flush()
+        start = perf_counter()
+        result = super().execute(sql, parameters)
+        rows = self.rowcount if self.rowcount >= 0 else 0
+        self._pending = (sql, parameters, perf_counter() - start, rows, False)
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        if not self._sampled():
+            return super().executemany(sql, seq_of_parameters)
+        self._flush()
+        start = perf_counter()
+        result = super().executemany(sql, seq_of_parameters)
+        self._pending = (sql, (), perf_counter() - start, self.rowcount, True)
+        return result
+
+    def _timed_fetch(self, fetch, *args, single=False):
+        if self._pending is None:
+            return fetch(*args)
+        start = perf_counter()
+        result = fetch(*args)
+        sql, params, elapsed, rows, many = self._pending
+        if single:
+            rows += result is not None
+        else:
+            rows += len(result)
+        self._pending = (sql, params, elapsed + perf_counter() - start, rows, many)
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone, single=True)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._timed_fetch(super().fetchmany)
+        return self._timed_fetch(super().fetchmany, size)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+    def close(self):
+        self._flush()
+        super().close()
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Ölçüm açıkken havuzun kullandığı bağlantı sınıfı."""
+
+    _sampled = False
+    _function = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = []
+
+    def cursor(self, factory=ProfilingCursor):
+        cur = super().cursor(factory)
+        if self._sampled:
+            self._cursors.append(cur)
+        return cur
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def _finish(self):
+        for cur in self._cursors:
+            if isinstance(cur, ProfilingCursor):
+                cur._flush()
+        self._cursors = []
+
+
+@contextmanager
+def profiled(connection_cm, function):
+    """Havuzdan alınan bağlantıyı örnekleme oranına göre ölçer; bağlantı
+    havuza dönerken fonksiyon süresi ve bekleyen cümleler kaydedilir."""
+    start = perf_counter()
+    with connection_cm as conn:
+        if not isinstance(conn, ProfilingConnection) or random.random() >= SAMPLE_RATE:
+            yield conn
+            return
+        conn._sampled = True
+        conn._function = function
+        try:
+            yield conn
+        finally:
+            conn._finish()
+            conn._sampled = False
+            conn._function = None
+            _record_function(function, perf_counter() - start)
+
+
+def get_stats():
+    """Fonksiyon ve cümle bazında toplanan istatistikleri ve yavaş sorguları döndürür."""
+    with _lock:
+        functions = [
+            {'function': name, 'calls': calls, 'total_ms': round(total * 1000, 2),
+             'avg_ms': round(total * 1000 / calls, 2), 'max_ms': round(worst * 1000, 2)}
+            for name, (calls, total, worst) in _function_stats.items()
+        ]
+        statements = [
+            {'statement': sql, 'calls': calls, 'total_ms': round(total * 1000, 2),
+             'avg_ms': round(total * 1000 / calls, 2), 'max_ms': round(worst * 1000, 2),
+             'rows': rows}
+            for sql, (calls, total, worst, rows) in _statement_stats.items()
+        ]
+        slow = list(_slow_queries)
+    functions.sort(key=lambda r: r['total_ms'], reverse=True)
+    statements.sort(key=lambda r: r['total_ms'], reverse=True)
+    return functions, statements, slow
+
+
+def reset_stats():
+    with _lock:
+        _function_stats.clear()
+        _statement_stats.clear()
+        _slow_queries.clear()
@@ -0,0 +1,57 @@
+"""Toplu hareket kaydında doğrulama ve tarih biçimi."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import cache
+import database
+
+
+@pytest.fixture
+def product_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'restaurant.db'))
+    cache.clear_caches()
+    database.init_db()
+    database.add_user('personel', 'sifre')
+    database.add_product('Un')
+    yield database.fetch_rows("SELECT id FROM products WHERE name = 'Un'")[0][0]
+    database.close_pool()
+
+
+def _row(product_id, **values):
+    return dict({'product_id': product_id, 'quantity': 1, 'unit': 'kg', 'total_price': 10}, **values)
+
+
+@pytest.mark.parametrize('value, stored', [
+    ('2024-03-01 10:00:00', '2024-03-01 10:00:00'),
+    ('2024-03-01T10:00:00', '2024-03-01 10:00:00'),
+    ('2024-03-01T10:00:00.750', '2024-03-01 10:00:00'),
+    ('2024-03-01T13:00:00+03:00', '2024-03-01 10:00:00'),
+    ('2024-03-01T10:00:00Z', '2024-03-01 10:00:00'),
+    ('2024-03-01', '2024-03-01 00:00:00'),
+    (datetime(2024, 3, 1, 10, 0), '2024-03-01 10:00:00'),
+    (datetime(2024, 3, 1, 13, 0, tzinfo=timezone(timedelta(hours=3))), '2024-03-01 10:00:00'),
+])
+def test_movement_dates_are_stored_as_utc_text(product_id, value, stored):
+    assert database.add_inventory_movements_bulk([_row(product_id, movement_date=value)], 1) == [
+        (True, "Stok başarıyla güncellendi")]
+    rows = database.fetch_rows("SELECT movement_date FROM inventory_movements")
+    assert [row[0] for row in rows] == [stored]
+    rollup = database.fetch_rows("SELECT day FROM movement_daily_rollup")
+    assert [row[0] for row in rollup] == [stored[:10]]
+
+
+def test_invalid_rows_are_reported_and_skipped(product_id):
+    results = database.add_inventory_movements_bulk([
+        _row(product_id, total_price='on'),
+        _row(product_id, quantity=None),
+        _row(product_id, total_price=float('nan')),
+        _row(product_id, total_price=-5),
+        _row(product_id, movement_date='01.03.2024'),
+        _row(product_id, quantity='2', total_price='12.5'),
+    ], 1)
+
+    assert [success for success, _ in results] == [False, False, False, False, False, True]
+    assert results[4][1].startswith("Geçersiz hareket tarihi")
+    inventory = database.fetch_rows("SELECT quantity, total_price FROM inventory")
+    assert [tuple(row) for row in inventory] == [(2, 12.5)]
@@ -0,0 +1,57 @@
+"""Yönetim betikleri ve CLI araçları hızlı açılmalı: ``-X importtime`` ile
+ölçülen içe aktarma süresi bütçeyi aşmamalı ve ağır paketler yüklenmemeli."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modül: içe aktarma süresi bütçesi (ms, ``-X importtime`` toplamı)
+IMPORT_BUDGET_MS = {
+    'database': 100,
+    'utils': 100,
+    'jobs': 100,
+    'init_admin': 100,
+    'create_demo_data': 100,
+    'generate_reports': 150,
+}
+HEAVY_MODULES = ('pandas', 'streamlit', 'xlsxwriter')
+# Ölçüm gürültüsüne karşı en iyi süre alınır
+REPEAT = 5
+
+
+def measure_import(module):
+    """Modülü temiz bir yorumlayıcıda içe aktarır.
+
+    Returns:
+        (toplam süre ms, yüklenen ağır paketler)
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True, cwd=APP_DIR,
+    )
+    total_ms = 0.0
+    heavy = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        if not cumulative.strip().isdigit():
+            continue  # başlık satırı
+        if name.split('.')[0] in HEAVY_MODULES:
+            heavy.add(name.split('.')[0])
+        if name == module:
+            total_ms = int(cumulative) / 1000
+    return total_ms, sorted(heavy)
+
+
+@pytest.mark.parametrize('module, budget', sorted(IMPORT_BUDGET_MS.items()))
+def test_import_budget(module, budget):
+    timings = []
+    for _ in range(REPEAT):
+        elapsed, heavy = measure_import(module)
+        assert heavy == [], f"{module} ağır paket yüklüyor: {', '.join(heavy)}"
+        timings.append(elapsed)
+    assert min(timings) <= budget, f"{module}: {min(timings):.1f} ms > {budget} ms"
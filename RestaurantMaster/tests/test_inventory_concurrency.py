@@ -0,0 +1,62 @@
+"""Aynı ürüne birden çok süreçten aynı anda yazılan stok hareketleri."""
+import multiprocessing
+
+import database
+
+WORKERS = 8
+MOVEMENTS_PER_WORKER = 50
+
+
+def _write_movements(db_path, product_id, user_id, barrier, results):
+    database.DB_PATH = db_path
+    barrier.wait()
+    failures = []
+    for _ in range(MOVEMENTS_PER_WORKER):
+        success, message = database.add_inventory_movement(product_id, 1, 'kg', 2.5, user_id)
+        if not success:
+            failures.append(message)
+    database.close_pool()
+    results.put(failures)
+
+
+def test_concurrent_movements_keep_single_inventory_row(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'restaurant.db')
+    monkeypatch.setattr(database, 'DB_PATH', db_path)
+    database.init_db()
+    assert database.add_user('personel', 'sifre')[0]
+    assert database.add_product('Eşzamanlı Test Ürünü')[0]
+    user_id = database.fetch_rows("SELECT id FROM users WHERE username = 'personel'")[0][0]
+    product_id = database.fetch_rows(
+        "SELECT id FROM products WHERE name = 'Eşzamanlı Test Ürünü'")[0][0]
+    database.close_pool()
+
+    # Süreçler aynı anda başlasın diye hepsi engelde beklenir; ürünün stok
+    # satırı henüz yoktur, yani ilk yazmalar aynı satırı eklemeye çalışır
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_write_movements,
+                        args=(db_path, product_id, user_id, barrier, results))
+        for _ in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    failures = [message for _ in processes for message in results.get(timeout=120)]
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    assert failures == []
+    total = WORKERS * MOVEMENTS_PER_WORKER
+    inventory = database.fetch_rows(
+        "SELECT quantity, total_price FROM inventory WHERE product_id = ?", (product_id,))
+    movements = database.fetch_rows(
+        "SELECT COUNT(*), SUM(quantity_change), SUM(total_price) FROM inventory_movements "
+        "WHERE product_id = ?", (product_id,))[0]
+    database.close_pool()
+
+    assert len(inventory) == 1
+    assert tuple(movements) == (total, total, total * 2.5)
+    assert inventory[0]['quantity'] == movements[1]
+    assert inventory[0]['total_price'] == movements[2]
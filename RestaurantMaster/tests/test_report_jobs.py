@@ -0,0 +1,53 @@
+"""Arka plan rapor işleri, sunucu sürecindeki yazmalardan sonra güncel veri üretir."""
+import time
+import zipfile
+
+import pytest
+
+import cache
+import database
+import jobs
+
+RANGE = ('2024-01-01 00:00:00', '2024-12-31 23:59:59')
+
+
+@pytest.fixture
+def job_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'restaurant.db'))
+    monkeypatch.setattr(jobs, 'REPORT_JOB_DIR', str(tmp_path / 'report_jobs'))
+    # Tek işçi: ikinci iş ilk işin süreciyle (ve önbelleğiyle) çalışır
+    monkeypatch.setattr(jobs, 'REPORT_JOB_WORKERS', 1)
+    cache.clear_caches()
+    database.init_db()
+    database.add_user('personel', 'sifre')
+    database.add_product('Un')
+    product_id = database.fetch_rows("SELECT id FROM products WHERE name = 'Un'")[0][0]
+    yield product_id
+    jobs.shutdown()
+    database.close_pool()
+
+
+def _run(kind):
+    success, job_id = jobs.submit_report_job(kind, *RANGE, user_id=1)
+    assert success, job_id
+    deadline = time.time() + 120
+    while jobs.get_job(job_id)['status'] not in (jobs.DONE, jobs.FAILED):
+        assert time.time() < deadline
+        time.sleep(0.1)
+    assert jobs.get_job(job_id)['status'] == jobs.DONE, jobs.get_job(job_id)['error']
+    return jobs.get_job(job_id)['path']
+
+
+def _sheet_xml(path):
+    with zipfile.ZipFile(path) as workbook:
+        return workbook.read('xl/worksheets/sheet1.xml').decode()
+
+
+def test_resubmitted_job_sees_new_writes(job_db):
+    movement = {'product_id': job_db, 'quantity': 10, 'unit': 'kg',
+                'movement_date': '2024-03-01 10:00:00'}
+    database.add_inventory_movements_bulk([dict(movement, total_price=3380.3)], 1)
+    assert '3380.3' in _sheet_xml(_run('summary_xlsx'))
+
+    database.add_inventory_movements_bulk([dict(movement, total_price=1000)], 1)
+    assert '4380.3' in _sheet_xml(_run('summary_xlsx'))
@@ -0,0 +1,60 @@
+"""Yerel saatle sorulan geçmiş stok ve ay kapanışı (hareket tarihleri UTC)."""
+import time
+
+import pytest
+
+import cache
+import database
+
+
+@pytest.fixture
+def istanbul_db(tmp_path, monkeypatch):
+    # UTC+3: yerel 31.03 23:30 ve 01.04 00:30, UTC'de 20:30 ve 21:30'dur
+    monkeypatch.setenv('TZ', 'Europe/Istanbul')
+    time.tzset()
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'restaurant.db'))
+    # Referans tablo önbelleği önceki testlerin veritabanından kalmasın
+    cache.clear_caches()
+    database.init_db()
+    database.add_user('personel', 'sifre')
+    database.add_product('Un')
+    product_id = database.fetch_rows("SELECT id FROM products WHERE name = 'Un'")[0][0]
+    database.add_inventory_movements_bulk([
+        {'product_id': product_id, 'quantity': 10, 'unit': 'kg', 'total_price': 100,
+         'movement_date': '2024-03-31 20:30:00'},
+        {'product_id': product_id, 'quantity': 5, 'unit': 'kg', 'total_price': 50,
+         'movement_date': '2024-03-31 21:30:00'},
+        {'product_id': product_id, 'quantity': 2, 'unit': 'kg', 'total_price': 20,
+         'movement_date': '2024-04-02 12:00:00'},
+    ], 1)
+    yield
+    database.close_pool()
+    monkeypatch.delenv('TZ')
+    time.tzset()
+
+
+def _quantity(timestamp):
+    cache.clear_caches()
+    df = database.get_stock_as_of(timestamp)
+    return df['quantity'].sum() if not df.empty else 0
+
+
+def test_as_of_uses_local_time(istanbul_db):
+    assert _quantity('2024-03-31 23:29:59') == 0
+    assert _quantity('2024-03-31 23:30:00') == 10
+    assert _quantity('2024-03-31 23:59:59') == 10
+    assert _quantity('2024-04-01 00:30:00') == 15
+    assert _quantity('2024-04-10 00:00:00') == 17
+
+
+def test_close_period_ends_at_local_month_end(istanbul_db):
+    assert database.close_period(2024, 3, 1)[0]
+    boundary = database.fetch_rows("SELECT boundary FROM stock_periods WHERE period = '2024-03'")[0][0]
+    assert boundary == '2024-03-31 21:00:00'
+    snapshot = database.fetch_rows("SELECT SUM(quantity) FROM stock_snapshots WHERE period = '2024-03'")
+    assert snapshot[0][0] == 10
+
+    # Kapanıştan sonraki sorgular kapanış bakiyesinden başlar
+    assert _quantity('2024-03-31 23:59:59') == 10
+    assert _quantity('2024-04-01 00:30:00') == 15
+    assert _quantity('2024-04-10 00:00:00') == 17
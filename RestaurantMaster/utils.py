@@ -1,93 +1,248 @@
-import pandas as pd
-import streamlit as st
 from datetime import datetime
+import csv
 import io
+from cache import cached_export
+from database import get_summary_report, iter_detailed_movements_report
+
+# Sütun adına göre hücre biçimi seçimi
+DATE_COLUMN_MARKER = 'TARİH'
+NUMBER_COLUMN_MARKERS = ('FİYAT', 'MİKTAR')
+SHEET_NAME = 'Stok Raporu'
 
-def export_to_excel(df, start_date=None, end_date=None):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name='Stok Raporu', index=False, startrow=2)
 
-        workbook = writer.book
-        worksheet = writer.sheets['Stok Raporu']
+def _column_width(series, is_number):
+    """Sütun genişliğini satır satır dolaşmadan hesaplar."""
+    header_len = len(str(series.name))
+    if series.empty:
+        return header_len + 2
+    if is_number:
+        values = series.dropna()
+        widest = 0
+        if not values.empty:
+            widest = max(len(f"{values.max():,.2f}"), len(f"{values.min():,.2f}"))
+    else:
+        widest = series.astype(str).str.len().max()
+    return max(widest, header_len) + 2
 
+
+def _add_formats(workbook):
+    return {
         # Başlık formatı
-        header_format = workbook.add_format({
+        'header': workbook.add_format({
             'bold': True,
             'text_wrap': True,
             'valign': 'vcenter',
             'align': 'center',
             'border': 1,
             'bg_color': '#D7E4BC'
-        })
-
+        }),
         # Tarih başlığı formatı
-        title_format = workbook.add_format({
+        'title': workbook.add_format({
             'bold': True,
             'font_size': 14,
             'align': 'center',
             'valign': 'vcenter',
             'border': 0
-        })
-
-        # Tarih aralığı başlığı
-        if start_date and end_date:
-            title = f"Stok Raporu\n{start_date} - {end_date}"
-            worksheet.merge_range('A1:F1', title, title_format)
-
+        }),
         # Veri hücresi formatları
-        cell_format = workbook.add_format({
+        'cell': workbook.add_format({
             'align': 'left',
             'valign': 'vcenter',
             'border': 1,
             'text_wrap': True
-        })
-
-        number_format = workbook.add_format({
+        }),
+        'number': workbook.add_format({
             'align': 'right',
             'valign': 'vcenter',
             'border': 1,
             'num_format': '#,##0.00'
-        })
-
-        date_format = workbook.add_format({
+        }),
+        'date': workbook.add_format({
             'align': 'center',
             'valign': 'vcenter',
             'border': 1,
             'num_format': 'dd.mm.yyyy hh:mm'
-        })
-
-        # Başlıkları formatla
-        for col_num, value in enumerate(df.columns.values):
-            worksheet.write(2, col_num, value, header_format)
-
-        # Veri hücrelerini formatla
-        for row in range(len(df)):
-            for col in range(len(df.columns)):
-                value = df.iloc[row, col]
-                col_name = df.columns[col]
-
-                if 'TARİH' in col_name:
-                    worksheet.write(row + 3, col, value, date_format)
-                elif isinstance(value, (int, float)) and ('FİYAT' in col_name or 'MİKTAR' in col_name):
-                    worksheet.write(row + 3, col, value, number_format)
-                else:
-                    worksheet.write(row + 3, col, value, cell_format)
-
-        # Sütun genişliklerini ayarla
-        for idx, col in enumerate(df.columns):
-            series = df[col]
-            max_len = max(
-                series.astype(str).apply(len).max(),
-                len(str(series.name))
-            ) + 2
-            worksheet.set_column(idx, idx, max_len)
-
-        # Satır yüksekliğini ayarla
-        worksheet.set_default_row(20)
-        worksheet.set_row(2, 25)  # Başlık satırı için ekstra yükseklik
+        }),
+    }
+
+
+def _column_format(formats, col_name, is_number):
+    if DATE_COLUMN_MARKER in col_name:
+        return formats['date']
+    if is_number:
+        return formats['number']
+    return formats['cell']
 
+
+def _write_sheet_header(worksheet, formats, columns, start_date, end_date):
+    # Satır yüksekliğini ayarla
+    worksheet.set_default_row(20)
+
+    # Tarih aralığı başlığı
+    if start_date and end_date:
+        title = f"Stok Raporu\n{start_date} - {end_date}"
+        worksheet.merge_range('A1:F1', title, formats['title'])
+
+    # Başlıklar (constant_memory kipinde satırlar sırayla yazılmalı)
+    worksheet.set_row(2, 25)  # Başlık satırı için ekstra yükseklik
+    for col_num, value in enumerate(columns):
+        worksheet.write_string(2, col_num, value, formats['header'])
+
+
+def _write_rows(worksheet, writers, rows, first_row):
+    for row_num, values in enumerate(rows, start=first_row):
+        for col_num, value in enumerate(values):
+            write, cell_fmt = writers[col_num]
+            if value is None or value != value:  # None veya NaN
+                worksheet.write_blank(row_num, col_num, None, cell_fmt)
+            else:
+                write(row_num, col_num, value, cell_fmt)
+
+
+def export_to_excel(df, start_date=None, end_date=None):
+    """DataFrame'i biçimli bir Excel dosyasına (bytes) dönüştürür.
+
+    Her hücre tek kez, sütun düzeyinde seçilen biçimle yazılır. xlsxwriter
+    ``constant_memory`` kipinde satırları geçici dosyaya akıttığı için bellek
+    kullanımı satır sayısıyla büyümez.
+    """
+    # pandas ve xlsxwriter yalnızca dışa aktarım yapıldığında yüklenir
+    import pandas as pd
+    import xlsxwriter
+
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet(SHEET_NAME)
+    formats = _add_formats(workbook)
+
+    # Her sütun için biçim ve yazma fonksiyonu bir kez seçilir
+    writers = []
+    for idx, col_name in enumerate(df.columns):
+        series = df[col_name]
+        is_number = (pd.api.types.is_numeric_dtype(series)
+                     and any(marker in col_name for marker in NUMBER_COLUMN_MARKERS))
+        # Tür kontrolü hücre başına değil sütun başına yapılır
+        if pd.api.types.infer_dtype(series, skipna=True) == 'string':
+            write = worksheet.write_string
+        elif pd.api.types.is_numeric_dtype(series):
+            write = worksheet.write_number
+        else:
+            write = worksheet.write
+        writers.append((write, _column_format(formats, col_name, is_number)))
+        worksheet.set_column(idx, idx, _column_width(series, is_number))
+
+    _write_sheet_header(worksheet, formats, df.columns.values, start_date, end_date)
+    _write_rows(worksheet, writers, df.itertuples(index=False, name=None), first_row=3)
+
+    workbook.close()
     return output.getvalue()
 
+
+def stream_to_excel(batches, output, start_date=None, end_date=None, progress=None):
+    """Sütun adları ve satır gruplarından oluşan akışı (ör.
+    ``database.iter_detailed_movements_report``) DataFrame'e çevirmeden Excel'e
+    yazar. ``output`` dosya yolu ya da ikili dosya nesnesidir; ``progress``
+    verilirse her gruptan sonra yazılan satır sayısıyla çağrılır.
+
+    Sütun türleri ilk satır grubundan belirlenir; genişlikler yazarken
+    güncellenir. Bellek kullanımı satır sayısından bağımsızdır.
+    """
+    import xlsxwriter
+
+    batches = iter(batches)
+    columns = list(next(batches))
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet(SHEET_NAME)
+    formats = _add_formats(workbook)
+    _write_sheet_header(worksheet, formats, columns, start_date, end_date)
+
+    writers = None
+    number_columns = []
+    widths = [len(col_name) for col_name in columns]
+    row_num = 3
+    for rows in batches:
+        if writers is None:
+            writers = []
+            for idx, col_name in enumerate(columns):
+                sample = next((row[idx] for row in rows if row[idx] is not None), None)
+                is_number = (isinstance(sample, (int, float))
+                             and any(marker in col_name for marker in NUMBER_COLUMN_MARKERS))
+                write = worksheet.write_string if isinstance(sample, str) else worksheet.write
+                writers.append((write, _column_format(formats, col_name, is_number)))
+                number_columns.append(is_number)
+        _write_rows(worksheet, writers, rows, first_row=row_num)
+        row_num += len(rows)
+        if progress is not None:
+            progress(row_num - 3)
+
+        # Sütun genişlikleri sütun bazında güncellenir
+        for idx, values in enumerate(zip(*rows)):
+            present = [value for value in values if value is not None]
+            if not present:
+                continue
+            if number_columns[idx]:
+                widest = max(len(f"{max(present):,.2f}"), len(f"{min(present):,.2f}"))
+            else:
+                widest = max(map(len, map(str, present)))
+            widths[idx] = max(widths[idx], widest)
+
+    for idx, width in enumerate(widths):
+        worksheet.set_column(idx, idx, width + 2)
+    workbook.close()
+    return row_num - 3
+
+
+def stream_to_csv(batches, output, progress=None):
+    """Akışı CSV olarak ``output`` ikili dosyasına yazar (Excel'in Türkçe
+    karakterleri tanıması için UTF-8 BOM ile)."""
+    batches = iter(batches)
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(next(batches))
+    count = 0
+    for rows in batches:
+        writer.writerows(rows)
+        count += len(rows)
+        if progress is not None:
+            progress(count)
+    text.flush()
+    text.detach()
+    return count
+
+
+def deferred_export(name, build, *args, **kwargs):
+    """``st.download_button`` için ertelenmiş veri fonksiyonu döndürür.
+
+    Dosya yalnızca butona tıklandığında ``build(dosya, *args, **kwargs)`` ile
+    diske yazılır ve (rapor adı, parametreler, veri sürümü) anahtarıyla
+    önbelleğe alınır; içerik diskteki dosyadan okunur ve dosya hemen kapatılır.
+    Parametreler çağrı anında bağlandığı için sonraki yeniden çalıştırmalar
+    butonun üreteceği dosyayı değiştirmez.
+    """
+    key = (args, tuple(sorted(kwargs.items())))
+
+    def read():
+        with cached_export(name, key, lambda output: build(output, *args, **kwargs)) as output:
+            return output.read()
+    return read
+
+
+def export_detailed_report(output, start_date, end_date, file_format='xlsx', title_range=(None, None)):
+    """Detaylı hareket raporunu imleçten akıtarak ``output`` dosyasına yazar."""
+    batches = iter_detailed_movements_report(start_date, end_date)
+    if file_format == 'csv':
+        stream_to_csv(batches, output)
+    else:
+        stream_to_excel(batches, output, start_date=title_range[0], end_date=title_range[1])
+
+
+def export_summary_report(output, start_date, end_date, title_range=(None, None)):
+    """Özet raporu Excel dosyası olarak ``output`` dosyasına yazar."""
+    output.write(export_to_excel(
+        get_summary_report(start_date, end_date),
+        start_date=title_range[0], end_date=title_range[1]
+    ))
+
+
 def format_date(date_str):
     return datetime.strptime(date_str, '%Y-%m-%d').strftime('%d.%m.%Y')